@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -70,7 +71,7 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 DATABASES = {
-    'default': env.db('DATABASE_URL', engine='django.db.backends.postgresql')
+    'default': env.db('DATABASE_URL')
 }
 
 
@@ -136,13 +137,49 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '50/hour',
-        'user': '200/hour',
+        'anon': env('THROTTLE_ANON_RATE', default='50/hour'),
+        'user': env('THROTTLE_USER_RATE', default='200/hour'),
     },
 }
 
 AUTH_USER_MODEL = 'user.User'
 
+TICKET_HOLD_MINUTES = env.int('TICKET_HOLD_MINUTES', default=15)
+TICKET_MAX_STRIPES = env.int('TICKET_MAX_STRIPES', default=64)
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    # Waiting room queue state, shared by every worker process. The database
+    # cache needs no extra service; redis:// takes the load off the database.
+    # Local memory would give each worker its own queue (check event.W001).
+    'waiting_room': env.cache('WAITING_ROOM_CACHE_URL', default='dbcache://waiting_room_cache?max_entries=1000000'),
+    # Catalog response cache: an in-process LRU by default. Use redis:// or
+    # memcached to share it between workers; filecache:// is a local stand-in.
+    'catalog': env.cache('CATALOG_CACHE_URL', default='locmemcache://catalog?max_entries=5000'),
+}
+
+WAITING_ROOM_CACHE = 'waiting_room'
+WAITING_ROOM_TOKEN_MAX_AGE = env.int('WAITING_ROOM_TOKEN_MAX_AGE', default=2 * 60 * 60)
+
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24)
+
+CATALOG_CACHE = 'catalog'
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=60)
+
+MOST_DISCOUNTED_TICKETS_LIMIT = env.int('MOST_DISCOUNTED_TICKETS_LIMIT', default=100)
+MOST_DISCOUNTED_TICKETS_CACHE_TIMEOUT = env.int('MOST_DISCOUNTED_TICKETS_CACHE_TIMEOUT', default=30)
+
+AUTOCOMPLETE_LIMIT = env.int('AUTOCOMPLETE_LIMIT', default=10)
+
+FULFILLMENT_MAX_ATTEMPTS = env.int('FULFILLMENT_MAX_ATTEMPTS', default=5)
+FULFILLMENT_RETRY_BACKOFF_SECONDS = env.int('FULFILLMENT_RETRY_BACKOFF_SECONDS', default=30)
+FULFILLMENT_LEASE_SECONDS = env.int('FULFILLMENT_LEASE_SECONDS', default=300)
+
+OUTBOX_MAX_ATTEMPTS = env.int('OUTBOX_MAX_ATTEMPTS', default=8)
+OUTBOX_RETRY_BACKOFF_SECONDS = env.int('OUTBOX_RETRY_BACKOFF_SECONDS', default=60)
+OUTBOX_LEASE_SECONDS = env.int('OUTBOX_LEASE_SECONDS', default=300)
+OUTBOX_RETENTION_DAYS = env.int('OUTBOX_RETENTION_DAYS', default=7)
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -168,6 +205,11 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Hand ticket PDF downloads to the web server instead of streaming them from
+# Django: an internal location aliased to MEDIA_ROOT, e.g. for nginx
+# `location /protected-media/ { internal; alias /app/media/; }`.
+TICKET_PDF_ACCEL_REDIRECT = env('TICKET_PDF_ACCEL_REDIRECT', default='')
+TICKET_RENDER_WORKERS = env.int('TICKET_RENDER_WORKERS', default=4)
 
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:8000",
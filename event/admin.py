@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import Event
 from .models import Ticket
 from .models import Category
@@ -6,10 +7,27 @@ from .models import PromoCode
 from .models import Order
 from .models import Review
 from .models import Wallet
+from .models import TicketHold
+from .models import TicketStripe
+from .models import FulfillmentJob
+from .models import OutboxMessage
+from .response_cache import invalidate, ticket_tags
 
 
 def mark_as_depleted(modeladmin, request, queryset):
-    queryset.update(quantity_avaible=0)
+    queryset.update(quantity_avaible=0, updated_at=timezone.now())
+    TicketStripe.objects.filter(ticket__in=queryset).update(quantity_avaible=0, updated_at=timezone.now())
+    invalidate(*ticket_tags(queryset.values_list('pk', flat=True)))
+
+def retry_fulfillment(modeladmin, request, queryset):
+    queryset.exclude(status=FulfillmentJob.Status.RUNNING).update(
+        status=FulfillmentJob.Status.PENDING, attempts=0, run_after=timezone.now(), updated_at=timezone.now(),
+    )
+
+def retry_outbox(modeladmin, request, queryset):
+    queryset.exclude(status=OutboxMessage.Status.SENDING).exclude(status=OutboxMessage.Status.SENT).update(
+        status=OutboxMessage.Status.PENDING, attempts=0, run_after=timezone.now(),
+    )
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
@@ -20,7 +38,7 @@ class EventAdmin(admin.ModelAdmin):
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
-    list_display = ['event', 'name', 'price', 'current_price', 'discount_percentage', 'quantity_avaible']
+    list_display = ['event', 'name', 'price', 'current_price', 'discount_percentage', 'quantity_avaible', 'stripe_count']
     list_filter = ['event', 'price']
     list_display_links = ['event']
     search_fields = ['event', 'name']
@@ -52,4 +70,25 @@ class ReviewAdmin(admin.ModelAdmin):
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ('user', 'balance')
\ No newline at end of file
+    list_display = ('user', 'balance')
+
+@admin.register(TicketHold)
+class TicketHoldAdmin(admin.ModelAdmin):
+    list_display = ('order', 'ticket', 'quantity', 'expires_at')
+    ordering = ('expires_at',)
+
+@admin.register(FulfillmentJob)
+class FulfillmentJobAdmin(admin.ModelAdmin):
+    list_display = ('order', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    ordering = ('-updated_at',)
+    actions = [retry_fulfillment]
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'run_after', 'sent_at')
+    list_filter = ('status',)
+    ordering = ('-created_at',)
+    # Bodies carry live one-time codes and attachments ticket PDFs.
+    exclude = ('body', 'attachments')
+    actions = [retry_outbox]
@@ -6,4 +6,5 @@ class EventConfig(AppConfig):
     name = 'event'
 
     def ready(self):
+        import event.checks
         import event.signals
\ No newline at end of file
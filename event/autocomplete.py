@@ -0,0 +1,34 @@
+from django.db.models import Value
+from django.db.models.functions import Collate, Now, Upper
+from .search import is_supported
+
+MIN_LENGTH = 2
+
+
+def _prefix_matches(queryset, field, term, limit):
+    if not is_supported(queryset):
+        return queryset.filter(**{f'{field}__istartswith': term}).order_by(Upper(field), 'date')[:limit]
+    # Under the byte-wise "C" collation the expression index serves both the
+    # LIKE 'TERM%' range and the ORDER BY, so the scan stops after `limit`
+    # rows however common the prefix is. The term goes through the same
+    # UPPER() as the index.
+    return (
+        queryset
+        .alias(prefix_key=Collate(Upper(field), 'C'))
+        .filter(prefix_key__startswith=Upper(Value(term)))
+        .order_by('prefix_key', 'date')[:limit]
+    )
+
+
+def autocomplete_events(queryset, term, limit):
+    """
+    Up to `limit` active, upcoming events whose title starts with `term`
+    (case-insensitively), topped up with events whose venue does. Each part
+    is one bounded scan over `event_title_prefix_idx`/`event_venue_prefix_idx`.
+    """
+    queryset = queryset.filter(is_active=True, date__gt=Now())
+    events = list(_prefix_matches(queryset, 'title', term, limit))
+    if len(events) < limit:
+        venues = queryset.exclude(pk__in=[event.pk for event in events])
+        events += _prefix_matches(venues, 'venue', term, limit - len(events))
+    return events
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+
+@register()
+def check_waiting_room_cache(app_configs, **kwargs):
+    # Queue positions and the admission frontier must be shared: a worker
+    # with its own copy never admits buyers who joined on another worker.
+    if isinstance(caches[settings.WAITING_ROOM_CACHE], LocMemCache):
+        return [
+            Warning(
+                'The waiting room cache is local to each process.',
+                hint=(
+                    'Set WAITING_ROOM_CACHE_URL to a shared cache (redis://, memcached, dbcache://) '
+                    'when serving with more than one worker process.'
+                ),
+                id='event.W001',
+            )
+        ]
+    return []
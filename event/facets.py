@@ -0,0 +1,44 @@
+from collections import Counter
+from django.db.models import Count
+from .models import Event
+
+FACET_LIMIT = 20
+
+
+def _top(counter):
+    return [
+        {'value': value, 'count': count}
+        for value, count in sorted(counter.items(), key=lambda item: (-item[1], item[0]))[:FACET_LIMIT]
+    ]
+
+
+def event_facets(queryset):
+    """
+    Category, language and venue counts for the events in `queryset`, the
+    largest `FACET_LIMIT` values of each. Language, venue and the total come
+    from one GROUP BY (language, venue); categories need a second query
+    through the m2m table.
+    """
+    events = Event.objects.filter(pk__in=queryset.order_by().values('pk'))
+
+    languages, venues = Counter(), Counter()
+    for row in events.values('language', 'venue').annotate(count=Count('pk')).order_by():
+        languages[row['language']] += row['count']
+        venues[row['venue']] += row['count']
+
+    categories = (
+        events.filter(category__isnull=False)
+        .values('category__id', 'category__name')
+        .annotate(count=Count('pk'))
+        .order_by('-count', 'category__name')[:FACET_LIMIT]
+    )
+
+    return {
+        'count': sum(languages.values()),
+        'category': [
+            {'id': row['category__id'], 'name': row['category__name'], 'count': row['count']}
+            for row in categories
+        ],
+        'language': _top(languages),
+        'venue': _top(venues),
+    }
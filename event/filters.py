@@ -1,5 +1,9 @@
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
 from django_filters import rest_framework as filters
-from .models import Event, Ticket
+from rest_framework import filters as drf_filters
+from .models import Event, Ticket, TicketStripe
+from .search import is_supported, search_events
 
 
 class EventFilter(filters.FilterSet):
@@ -10,11 +14,40 @@ class EventFilter(filters.FilterSet):
     category = filters.NumberFilter(field_name='category__id', lookup_expr='exact')
     language = filters.CharFilter(field_name='language', lookup_expr='exact')
     is_active = filters.BooleanFilter(field_name='is_active')
+    sold_out = filters.BooleanFilter(method='filter_sold_out', label='Is sold out')
+    price_min = filters.NumberFilter(method='filter_price_min', label='Lowest price from')
+    price_max = filters.NumberFilter(method='filter_price_max', label='Lowest price up to')
     
     class Meta:
         model = Event
         fields = []
 
+    # These match the with_ticket_summary() annotations but are written as
+    # EXISTS so the planner can use semi/anti joins instead of computing the
+    # summary for every event.
+
+    def filter_sold_out(self, queryset, name, value):
+        in_stock = (
+            Exists(Ticket.objects.filter(event=OuterRef('pk'), quantity_avaible__gt=0))
+            | Exists(TicketStripe.objects.filter(ticket__event=OuterRef('pk'), quantity_avaible__gt=0))
+        )
+        return queryset.filter(~in_stock if value else in_stock)
+
+    def _tickets_priced(self, **lookup):
+        return Exists(
+            Ticket.objects
+            .annotate(effective_price=Coalesce('current_price', 'price'))
+            .filter(event=OuterRef('pk'), **lookup)
+        )
+
+    def filter_price_min(self, queryset, name, value):
+        return queryset.filter(Exists(Ticket.objects.filter(event=OuterRef('pk')))).exclude(
+            self._tickets_priced(effective_price__lt=value)
+        )
+
+    def filter_price_max(self, queryset, name, value):
+        return queryset.filter(self._tickets_priced(effective_price__lte=value))
+
     
 class TicketFilter(filters.FilterSet):
     price_min = filters.NumberFilter(field_name='price', lookup_expr='gte')
@@ -29,7 +62,31 @@ class TicketFilter(filters.FilterSet):
 
     def filter_quantity(self, queryset, name, value):
         if value is True:
-            return queryset.filter(quantity_avaible__gt=0)
+            return queryset.with_available().filter(available__gt=0)
         if value is False:
-            return queryset.filter(quantity_avaible__lte=0)
-        return queryset
\ No newline at end of file
+            return queryset.with_available().filter(available__lte=0)
+        return queryset
+
+
+class EventSearchFilter(drf_filters.SearchFilter):
+    """
+    Ranked full-text search over Event.search_vector on PostgreSQL, plain
+    SearchFilter lookups elsewhere.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not is_supported(queryset):
+            return super().filter_queryset(request, queryset, view)
+
+        terms = request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+        if not terms:
+            return queryset
+        return search_events(queryset, terms)
+
+
+class EventOrderingFilter(drf_filters.OrderingFilter):
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank', *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
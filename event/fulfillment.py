@@ -0,0 +1,133 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import FulfillmentJob
+from .utils import generate_order_pdf, send_order_email
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def enqueue_order(order):
+    """One job per order, delivering its tickets as a single PDF."""
+    return FulfillmentJob.objects.get_or_create(order=order)[0]
+
+
+def retry_delay(attempts):
+    return min(timedelta(seconds=settings.FULFILLMENT_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)), MAX_BACKOFF)
+
+
+def claim_jobs(batch_size, now=None):
+    """
+    Leases up to `batch_size` due jobs to the caller. Jobs whose lease ran
+    out (their worker died) are due again. Concurrent workers skip each
+    other's rows instead of waiting on them.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            FulfillmentJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=FulfillmentJob.Status.PENDING, run_after__lte=now)
+                | Q(status=FulfillmentJob.Status.RUNNING, locked_until__lte=now)
+            )
+            .order_by('run_after')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        FulfillmentJob.objects.filter(id__in=ids).update(
+            status=FulfillmentJob.Status.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.FULFILLMENT_LEASE_SECONDS),
+            updated_at=timezone.now(),
+        )
+    return list(
+        FulfillmentJob.objects
+        .filter(id__in=ids)
+        .select_related('order__customer')
+        .order_by('run_after')
+    )
+
+
+def _finish(job, status, **fields):
+    # `attempts` fences the lease: a worker whose lease expired and was
+    # re-claimed cannot overwrite the newer attempt's outcome.
+    return FulfillmentJob.objects.filter(
+        pk=job.pk, status=FulfillmentJob.Status.RUNNING, attempts=job.attempts,
+    ).update(status=status, locked_until=None, updated_at=timezone.now(), **fields)
+
+
+def _start(job):
+    # The claim's lease covers the whole batch; restart it per job so a job
+    # at the end of a slow batch is not re-claimed while it is being sent.
+    # Fails if the lease already ran out and another worker took the job.
+    return FulfillmentJob.objects.filter(
+        pk=job.pk, status=FulfillmentJob.Status.RUNNING, attempts=job.attempts,
+    ).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.FULFILLMENT_LEASE_SECONDS),
+        updated_at=timezone.now(),
+    )
+
+
+def run_job(job):
+    if job.attempts > settings.FULFILLMENT_MAX_ATTEMPTS:
+        _finish(job, FulfillmentJob.Status.FAILED, last_error='Worker lease expired on the last attempt')
+        return False
+    if not _start(job):
+        return False
+
+    order = job.order
+    try:
+        pdf_path = generate_order_pdf(order)
+        # The email is queued only if the job is still ours to finish, and
+        # both commit together: a crash in between cannot queue it twice.
+        with transaction.atomic():
+            send_order_email(order, pdf_path)
+            if not _finish(job, FulfillmentJob.Status.DONE, last_error=''):
+                transaction.set_rollback(True)
+                return False
+    except Exception as exc:
+        logger.exception('Fulfillment of order %s failed (attempt %s)', order.pk, job.attempts)
+        fields = {'last_error': f'{type(exc).__name__}: {exc}'}
+        if job.attempts >= settings.FULFILLMENT_MAX_ATTEMPTS:
+            _finish(job, FulfillmentJob.Status.FAILED, **fields)
+        else:
+            _finish(job, FulfillmentJob.Status.PENDING, run_after=timezone.now() + retry_delay(job.attempts), **fields)
+        return False
+    return True
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        connections.close_all()
+
+
+def process_jobs(batch_size=100, workers=1, now=None):
+    """
+    Claims one batch and renders/delivers it on `workers` threads. Returns
+    (claimed, delivered).
+    """
+    jobs = claim_jobs(batch_size, now)
+    if workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_in_thread, jobs))
+    else:
+        results = [run_job(job) for job in jobs]
+    return len(jobs), sum(results)
+
+
+def fulfillment_status(order):
+    job = FulfillmentJob.objects.filter(order=order).values('status', 'attempts').first()
+    if job is None:
+        return {'order': order.pk, 'status': None, 'attempts': 0}
+    status = job['status']
+    if status == FulfillmentJob.Status.RUNNING:
+        status = FulfillmentJob.Status.PENDING
+    return {'order': order.pk, 'status': status, 'attempts': job['attempts']}
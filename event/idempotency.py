@@ -0,0 +1,103 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _request_hash(request, args, kwargs):
+    payload = json.dumps(
+        [request.method, request.path, args, kwargs, request.data],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _in_progress():
+    return Response(
+        {'error': f'A request with this {HEADER} is still being processed.'},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response(
+            {'error': f'This {HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.response_status is None:
+        return _in_progress()
+
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """
+    Lets clients retry an APIView handler safely with an `Idempotency-Key`
+    header: the first response is stored per user and key, and retries with
+    the same request get it back without running the handler again.
+    """
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({'error': f'{HEADER} is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = _request_hash(request, args, kwargs)
+        now = timezone.now()
+        keys = IdempotencyKey.objects.filter(user=request.user, key=key)
+        keys.filter(expires_at__lte=now).delete()
+
+        # The key, the handler's writes and the stored response commit
+        # together. A concurrent retry waits on the unique index and then
+        # replays; a worker that dies mid-request rolls the key back with
+        # everything else, so the retry simply runs again.
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        request_hash=request_hash,
+                        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+                    )
+            except IntegrityError:
+                record = keys.first()
+                return _replay(record, request_hash) if record else _in_progress()
+
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+
+            record.response_status = response.status_code
+            record.response_body = json.loads(JSONRenderer().render(response.data) or 'null')
+            record.save(update_fields=['response_status', 'response_body'])
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(now=None, batch_size=1000):
+    now = now or timezone.now()
+    purged = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
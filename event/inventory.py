@@ -0,0 +1,209 @@
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from .models import Order, Ticket, TicketHold, TicketStripe
+from .response_cache import invalidate, ticket_tags
+
+
+class _StockShortfall(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+
+    def __init__(self, ticket):
+        self.ticket = ticket
+        super().__init__(
+            f"Only {ticket.available_quantity()} tickets available for '{ticket.event} - {ticket.name}' tickets."
+        )
+
+
+def _per_ticket(quantities):
+    return Case(
+        *[When(id=ticket_id, then=Value(quantity)) for ticket_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve_tickets(quantities):
+    """
+    Takes `quantities` ({ticket_id: quantity}) out of stock with a single
+    conditional UPDATE. Either every ticket is decremented or none is.
+    """
+    quantities = {ticket_id: quantity for ticket_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+
+    try:
+        with transaction.atomic():
+            amount = _per_ticket(quantities)
+            updated = Ticket.objects.filter(
+                id__in=quantities,
+                stripe_count=0,
+                quantity_avaible__gte=amount,
+            ).update(quantity_avaible=F('quantity_avaible') - amount, updated_at=timezone.now())
+
+            if updated != len(quantities):
+                striped = dict(
+                    Ticket.objects.filter(id__in=quantities, stripe_count__gt=0).values_list('id', 'stripe_count')
+                )
+                if updated + len(striped) != len(quantities):
+                    raise _StockShortfall()
+                for ticket_id, stripe_count in striped.items():
+                    _reserve_striped(ticket_id, stripe_count, quantities[ticket_id])
+            invalidate(*ticket_tags(quantities))
+    except _StockShortfall:
+        tickets = list(Ticket.objects.with_available().select_related('event').filter(id__in=quantities))
+        short = [ticket for ticket in tickets if ticket.available < quantities[ticket.id]]
+        raise InsufficientStock((short or tickets)[0]) from None
+
+
+def _reserve_striped(ticket_id, stripe_count, quantity):
+    start = random.randrange(stripe_count)
+    for offset in range(stripe_count):
+        index = (start + offset) % stripe_count
+        if TicketStripe.objects.filter(
+            ticket_id=ticket_id,
+            index=index,
+            quantity_avaible__gte=quantity,
+        ).update(quantity_avaible=F('quantity_avaible') - quantity, updated_at=timezone.now()):
+            return
+
+    # No single stripe is big enough: drain them one by one, then fall back to
+    # whatever has been released onto the ticket row itself.
+    remaining = quantity
+    stripes = TicketStripe.objects.select_for_update().filter(ticket_id=ticket_id, quantity_avaible__gt=0)
+    for stripe in stripes:
+        taken = min(stripe.quantity_avaible, remaining)
+        TicketStripe.objects.filter(pk=stripe.pk).update(
+            quantity_avaible=F('quantity_avaible') - taken,
+            updated_at=timezone.now(),
+        )
+        remaining -= taken
+        if not remaining:
+            return
+
+    if not Ticket.objects.filter(
+        id=ticket_id,
+        quantity_avaible__gte=remaining,
+    ).update(quantity_avaible=F('quantity_avaible') - remaining, updated_at=timezone.now()):
+        raise _StockShortfall()
+
+
+def set_striping(ticket, stripes, total=None):
+    """
+    Spreads the ticket's stock over `stripes` counter rows so that concurrent
+    buyers do not all queue on the ticket row. `stripes=0` folds the stock
+    back into `Ticket.quantity_avaible`. `total` replaces the stock instead of
+    keeping the current amount.
+    """
+    with transaction.atomic():
+        ticket = Ticket.objects.select_for_update().get(pk=ticket.pk)
+        current = list(TicketStripe.objects.select_for_update().filter(ticket=ticket))
+        if total is None:
+            total = ticket.quantity_avaible + sum(stripe.quantity_avaible for stripe in current)
+
+        TicketStripe.objects.filter(ticket=ticket).delete()
+        if stripes:
+            share, extra = divmod(total, stripes)
+            TicketStripe.objects.bulk_create([
+                TicketStripe(ticket=ticket, index=index, quantity_avaible=share + (1 if index < extra else 0))
+                for index in range(stripes)
+            ])
+
+        Ticket.objects.filter(pk=ticket.pk).update(
+            stripe_count=stripes,
+            quantity_avaible=0 if stripes else total,
+            updated_at=timezone.now(),
+        )
+        ticket.stripe_count = stripes
+        ticket.quantity_avaible = 0 if stripes else total
+        invalidate(*ticket_tags([ticket.pk]))
+    return ticket
+
+
+def release_tickets(quantities):
+    quantities = {ticket_id: quantity for ticket_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return 0
+
+    invalidate(*ticket_tags(quantities))
+    return Ticket.objects.filter(id__in=quantities).update(
+        quantity_avaible=F('quantity_avaible') + _per_ticket(quantities),
+        updated_at=timezone.now(),
+    )
+
+
+def _sum_by_ticket(rows):
+    quantities = {}
+    for ticket_id, quantity in rows:
+        quantities[ticket_id] = quantities.get(ticket_id, 0) + quantity
+    return quantities
+
+
+def hold_tickets(order, quantities, minutes=None):
+    if minutes is None:
+        minutes = settings.TICKET_HOLD_MINUTES
+    expires_at = timezone.now() + timedelta(minutes=minutes)
+
+    return TicketHold.objects.bulk_create([
+        TicketHold(order=order, ticket_id=ticket_id, quantity=quantity, expires_at=expires_at)
+        for ticket_id, quantity in quantities.items()
+        if quantity > 0
+    ])
+
+
+def lock_order_holds(order):
+    """
+    Locks the order's holds for the current transaction and returns them.
+    Take these locks before the order row's: release_expired_holds locks
+    holds first as well and skips the ones locked here.
+    """
+    return list(TicketHold.objects.select_for_update().filter(order=order).order_by('id'))
+
+
+def clear_order_holds(order):
+    return TicketHold.objects.filter(order=order).delete()[0]
+
+
+def release_order_holds(order):
+    with transaction.atomic():
+        holds = TicketHold.objects.select_for_update().filter(order=order)
+        quantities = _sum_by_ticket(holds.values_list('ticket_id', 'quantity'))
+        release_tickets(quantities)
+        holds.delete()
+    return quantities
+
+
+def release_expired_holds(now=None, batch_size=1000):
+    """
+    Puts the stock of expired holds back on sale and cancels their pending
+    orders, `batch_size` holds per transaction. Returns the number of holds
+    released.
+    """
+    now = now or timezone.now()
+    released = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                TicketHold.objects
+                .select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', 'order_id', 'ticket_id', 'quantity')[:batch_size]
+            )
+            if not batch:
+                return released
+
+            release_tickets(_sum_by_ticket((ticket_id, quantity) for _, _, ticket_id, quantity in batch))
+            Order.objects.filter(
+                id__in={order_id for _, order_id, _, _ in batch},
+                status=Order.OrderStatus.PENDING,
+            ).update(status=Order.OrderStatus.CANCELLED, updated_at=timezone.now())
+            TicketHold.objects.filter(id__in=[hold_id for hold_id, _, _, _ in batch]).delete()
+
+        released += len(batch)
@@ -0,0 +1,82 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+from event.management.commands import benchmark_event_search
+from event.models import Event
+from event.views import EventViewSet
+from user.models import User
+
+PREFIXES = ['ja', 'jaz', 'fes', 'sum', 'ope', 'кон', 'теа', 'mü', 'gre', 'bak', 'crystal h', 'zz']
+
+
+class Command(benchmark_event_search.Command):
+    help = (
+        'Seeds a large event catalog (shared with benchmark_event_search) and compares the autocomplete '
+        'endpoint with /api/events/?search= per keystroke, both with the response cache cleared.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000)
+        parser.add_argument('--runs', type=int, default=200)
+        parser.add_argument('--prefixes', nargs='+', default=PREFIXES)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded events afterwards.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Autocomplete benchmarks need PostgreSQL.')
+
+        organizer, _ = User.objects.get_or_create(
+            username=benchmark_event_search.ORGANIZER,
+            defaults={'email': f'{benchmark_event_search.ORGANIZER}@example.com', 'role': User.Role.ORGANIZER},
+        )
+        self.seed(organizer, options['events'])
+        self.factory = APIRequestFactory()
+        self.user = organizer
+
+        header = f'{"prefix":<12}{"endpoint":<14}{"rows":>6}{"p50 ms":>9}{"p99 ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        totals = {}
+        for prefix in options['prefixes']:
+            for name, action, params, runs in [
+                ('autocomplete', 'autocomplete', {'q': prefix}, options['runs']),
+                ('search', 'list', {'search': prefix}, max(options['runs'] // 20, 3)),
+            ]:
+                rows, timings = self.measure_view(action, params, runs)
+                totals.setdefault(name, []).extend(timings)
+                self.stdout.write(
+                    f'{prefix:<12}{name:<14}{rows:>6}{statistics.median(timings):>9.2f}{self.p99(timings):>9.2f}'
+                )
+        self.stdout.write('-' * len(header))
+        for name, timings in totals.items():
+            self.stdout.write(f'{"all":<12}{name:<14}{"":>6}{statistics.median(timings):>9.2f}{self.p99(timings):>9.2f}')
+
+        if options['cleanup']:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {Event._meta.db_table} WHERE organizer_id = %s', [organizer.id])
+            organizer.delete()
+
+    def p99(self, timings):
+        return sorted(timings)[int(0.99 * (len(timings) - 1))]
+
+    def measure_view(self, action, params, runs):
+        # Hundreds of requests per prefix would trip the user rate limits.
+        view = EventViewSet.as_view({'get': action}, throttle_classes=[])
+        cache = caches[settings.CATALOG_CACHE]
+        timings = []
+        for _ in range(runs):
+            cache.clear()
+            request = self.factory.get('/', params)
+            force_authenticate(request, user=self.user)
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            if response.status_code != 200:
+                raise CommandError(f'{action} answered {response.status_code}: {response.data}')
+            timings.append((time.perf_counter() - started) * 1000)
+        data = response.data
+        return len(data['results'] if isinstance(data, dict) else data), timings
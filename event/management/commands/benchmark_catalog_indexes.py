@@ -0,0 +1,193 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from event.management.commands.benchmark_event_search import VENUES, WORDS
+from event.models import Category, Event, Ticket
+from event.views import EventViewSet, TicketViewSet
+from user.models import User
+
+ORGANIZER = 'index-benchmark'
+CATEGORIES = 20
+
+# (query shape, viewset, action, filter params, index it justifies)
+SHAPES = [
+    ('active future events by language', EventViewSet, 'list',
+     {'language': 'RU', 'is_active': 'true', 'date_after': '{now}'}, 'event_active_lang_date_idx'),
+    ('upcoming events', EventViewSet, 'upcoming', {}, 'event_active_date_idx'),
+    ('all events by date', EventViewSet, 'list', {}, 'event_date_idx'),
+    ('events at a venue', EventViewSet, 'list', {'venue': VENUES[2]}, 'event_venue_date_idx'),
+    ('event title contains', EventViewSet, 'list', {'title': 'jazz'}, 'event_title_trgm'),
+    ('events in a category', EventViewSet, 'list', {'category': '{category}'}, 'event_date_idx'),
+    ('tickets on sale for an event', TicketViewSet, 'list', {'event_id': '{event}', 'quantity': 'true'}, None),
+    ('tickets in a price range', TicketViewSet, 'list', {'price_min': 40, 'price_max': 42}, 'ticket_price_idx'),
+    ('tickets by event title', TicketViewSet, 'list', {'event_title': 'opera'}, 'event_title_trgm'),
+]
+
+
+def plan_indexes(node):
+    names = {node['Index Name']} if 'Index Name' in node else set()
+    for child in node.get('Plans', []):
+        names |= plan_indexes(child)
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a large catalog and runs EXPLAIN ANALYZE for each EventFilter/TicketFilter query shape, '
+        'with and without the index that serves it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=200_000)
+        parser.add_argument('--tickets-per-event', type=int, default=4)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--plans', action='store_true', help='Print the full plan for every query.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded catalog afterwards.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Index benchmarks need PostgreSQL.')
+
+        organizer, _ = User.objects.get_or_create(
+            username=ORGANIZER, defaults={'email': f'{ORGANIZER}@example.com', 'role': User.Role.ORGANIZER},
+        )
+        self.seed(organizer, options['events'], options['tickets_per_event'])
+        self.factory = APIRequestFactory()
+        self.runs = options['runs']
+        placeholders = {
+            'now': timezone.now().isoformat(),
+            'event': Event.objects.filter(organizer=organizer).values_list('id', flat=True).first(),
+            'category': Category.objects.filter(name__startswith=ORGANIZER).values_list('id', flat=True).first(),
+        }
+
+        header = (
+            f'{"query shape":<34}{"index":<32}{"rows":>7}'
+            f'{"page ms":>10}{"w/o index":>11}{"count ms":>10}{"w/o index":>11}'
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, viewset, action, params, index in SHAPES:
+            params = {key: str(value).format(**placeholders) for key, value in params.items()}
+            page, count = self.build_queries(viewset, action, params)
+
+            plan, page_ms = self.explain(page)
+            count_plan, count_ms = self.explain(count)
+            if options['plans']:
+                self.stdout.write(json.dumps([plan, count_plan], indent=2))
+            with connection.cursor() as cursor:
+                cursor.execute(*count)
+                rows = cursor.fetchone()[0]
+            used = plan_indexes(plan['Plan']) | plan_indexes(count_plan['Plan'])
+
+            if index is None or not self.index_exists(index):
+                label = ', '.join(sorted(used)) or 'seq scan' if index is None else f'{index} (missing)'
+                self.stdout.write(f'{name:<34}{label[:31]:<32}{rows:>7}{page_ms:>10.2f}{"-":>11}{count_ms:>10.2f}{"-":>11}')
+                continue
+
+            _, page_without = self.explain(page, drop=index)
+            _, count_without = self.explain(count, drop=index)
+            label = index if index in used else f'{index} (unused)'
+            self.stdout.write(
+                f'{name:<34}{label:<32}{rows:>7}{page_ms:>10.2f}{page_without:>11.2f}'
+                f'{count_ms:>10.2f}{count_without:>11.2f}'
+            )
+
+        if options['cleanup']:
+            self.cleanup(organizer)
+
+    def seed(self, organizer, total, tickets_per_event):
+        missing = total - Event.objects.filter(organizer=organizer).count()
+        if missing <= 0:
+            return
+
+        self.stdout.write(f'Seeding {missing} events with {tickets_per_event} tickets each...')
+        started = time.perf_counter()
+        Category.objects.bulk_create(
+            [Category(name=f'{ORGANIZER} {index}') for index in range(CATEGORIES)], ignore_conflicts=True,
+        )
+        categories = list(Category.objects.filter(name__startswith=ORGANIZER).values_list('id', flat=True))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH seeded AS (
+                    INSERT INTO {Event._meta.db_table}
+                        (title, description, date, venue, organizer_id, language, is_active,
+                         rating_sum, rating_count, updated_at)
+                    SELECT
+                        initcap(w[1 + floor(random() * cardinality(w))::int] || ' '
+                            || w[1 + floor(random() * cardinality(w))::int]),
+                        w[1 + floor(random() * cardinality(w))::int],
+                        now() - interval '180 days' + random() * interval '545 days',
+                        v[1 + floor(random() * cardinality(v))::int],
+                        %s,
+                        (ARRAY['EN', 'AZ', 'TR', 'RU'])[1 + floor(random() * 4)::int],
+                        random() < 0.9, 0, 0, now()
+                    FROM generate_series(1, %s), (SELECT %s::text[] AS w, %s::text[] AS v) AS vocabulary
+                    RETURNING id
+                ), tickets AS (
+                    INSERT INTO {Ticket._meta.db_table}
+                        (event_id, name, price, quantity_avaible, stripe_count, updated_at)
+                    SELECT seeded.id, 'Tier ' || tier, round((5 + random() * 295)::numeric, 2),
+                           CASE WHEN random() < 0.4 THEN 0 ELSE floor(random() * 500)::int END, 0, now()
+                    FROM seeded, generate_series(1, %s) AS tier
+                )
+                INSERT INTO {Event.category.through._meta.db_table} (event_id, category_id)
+                SELECT seeded.id, (%s::int[])[1 + floor(random() * %s)::int] FROM seeded
+                """,
+                [organizer.id, missing, WORDS, VENUES, tickets_per_event, categories, len(categories)],
+            )
+            for model in [Event, Ticket, Event.category.through]:
+                cursor.execute(f'VACUUM ANALYZE {model._meta.db_table}')
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def build_queries(self, viewset, action, params):
+        """The page query and the COUNT(*) that page-number pagination runs for it."""
+        view = viewset(action_map={'get': action}, format_kwarg=None)
+        request = view.initialize_request(self.factory.get('/', params))
+        view.request = request
+        view.kwargs = {}
+        queryset = view.filter_queryset(view.get_queryset())
+
+        page = queryset[:view.paginator.page_size].query.sql_with_params()
+        sql, sql_params = queryset.order_by().values('pk').query.sql_with_params()
+        return page, (f'SELECT COUNT(*) FROM ({sql}) AS page', sql_params)
+
+    def explain(self, query, drop=None):
+        sql, params = query
+        timings = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if drop:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(drop)}')
+                for _ in range(self.runs):
+                    cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+                    plan = cursor.fetchone()[0]
+                    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+                    timings.append(plan['Execution Time'])
+            # Dropping inside a rolled back transaction leaves the index as it was.
+            transaction.set_rollback(True)
+        return plan, statistics.median(timings)
+
+    def index_exists(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [name])
+            return cursor.fetchone() is not None
+
+    def cleanup(self, organizer):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Ticket._meta.db_table} WHERE event_id IN (SELECT id FROM {Event._meta.db_table} WHERE organizer_id = %s)',
+                [organizer.id],
+            )
+            cursor.execute(
+                f'DELETE FROM {Event.category.through._meta.db_table} WHERE event_id IN (SELECT id FROM {Event._meta.db_table} WHERE organizer_id = %s)',
+                [organizer.id],
+            )
+            cursor.execute(f'DELETE FROM {Event._meta.db_table} WHERE organizer_id = %s', [organizer.id])
+        Category.objects.filter(name__startswith=ORGANIZER).delete()
+        organizer.delete()
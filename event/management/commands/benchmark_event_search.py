@@ -0,0 +1,128 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from rest_framework import filters as drf_filters
+from rest_framework.test import APIRequestFactory
+from event.filters import EventSearchFilter, EventOrderingFilter
+from event.models import Event
+from event.search import update_search_vectors
+from event.views import EventViewSet
+from user.models import User
+
+ORGANIZER = 'search-benchmark'
+
+WORDS = [
+    'rock', 'jazz', 'festival', 'summer', 'night', 'opera', 'symphony', 'comedy', 'stand-up', 'ballet',
+    'theatre', 'concert', 'orchestra', 'live', 'tour', 'acoustic', 'electronic', 'classical', 'folk', 'kids',
+    'konser', 'gecəsi', 'muğam', 'caz', 'festivalı', 'tiyatro', 'gösteri', 'yaz', 'müzik', 'şarkı',
+    'концерт', 'фестиваль', 'театр', 'опера', 'балет', 'джаз', 'вечер', 'музыка', 'летний', 'шоу',
+]
+VENUES = [
+    'Baku Crystal Hall', 'Heydar Aliyev Palace', 'Green Theatre', 'Rashid Behbudov Theatre', 'Baku Jazz Center',
+    'Opera and Ballet Theatre', 'Philharmonic Hall', 'Zorlu PSM', 'Crocus City Hall', 'Deniz Mall Stage',
+]
+TERMS = ['jazz', 'summer festival', 'opera ballet', 'концерт', 'tiyatro', 'crystal hall', 'muğam gecəsi']
+
+
+class Command(BaseCommand):
+    help = 'Seeds a large event catalog and compares SearchFilter (icontains) with the ranked full-text search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--terms', nargs='+', default=TERMS)
+        parser.add_argument('--explain', action='store_true', help='Print EXPLAIN ANALYZE for each query.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded events afterwards.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Full-text search benchmarks need PostgreSQL.')
+
+        organizer, _ = User.objects.get_or_create(
+            username=ORGANIZER, defaults={'email': f'{ORGANIZER}@example.com', 'role': User.Role.ORGANIZER},
+        )
+        self.seed(organizer, options['events'])
+        self.factory = APIRequestFactory()
+
+        header = f'{"terms":<22}{"backend":<10}{"matches":>9}{"median ms":>11}{"p95 ms":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for terms in options['terms']:
+            for name, backends in [
+                ('icontains', [drf_filters.SearchFilter, drf_filters.OrderingFilter]),
+                ('fts', [EventSearchFilter, EventOrderingFilter]),
+            ]:
+                count, timings = self.measure(backends, terms, options['runs'], options['explain'])
+                self.stdout.write(
+                    f'{terms:<22}{name:<10}{count:>9}{statistics.median(timings):>11.1f}'
+                    f'{sorted(timings)[int(0.95 * (len(timings) - 1))]:>9.1f}'
+                )
+
+        if options['cleanup']:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {Event._meta.db_table} WHERE organizer_id = %s', [organizer.id])
+            organizer.delete()
+
+    def seed(self, organizer, total):
+        existing = Event.objects.filter(organizer=organizer).count()
+        missing = total - existing
+        if missing <= 0:
+            return
+
+        self.stdout.write(f'Seeding {missing} events...')
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Event._meta.db_table}
+                    (title, description, date, venue, organizer_id, language, is_active, rating_sum, rating_count, updated_at)
+                SELECT
+                    initcap(w[1 + floor(random() * cardinality(w))::int] || ' '
+                        || w[1 + floor(random() * cardinality(w))::int] || ' '
+                        || w[1 + floor(random() * cardinality(w))::int]),
+                    w[1 + floor(random() * cardinality(w))::int] || ' '
+                        || w[1 + floor(random() * cardinality(w))::int] || ' '
+                        || w[1 + floor(random() * cardinality(w))::int] || ' '
+                        || w[1 + floor(random() * cardinality(w))::int],
+                    now() + random() * interval '365 days',
+                    v[1 + floor(random() * cardinality(v))::int],
+                    %s,
+                    (ARRAY['EN', 'AZ', 'TR', 'RU'])[1 + floor(random() * 4)::int],
+                    true, 0, 0, now()
+                FROM generate_series(1, %s), (SELECT %s::text[] AS w, %s::text[] AS v) AS vocabulary
+                """,
+                [organizer.id, missing, WORDS, VENUES],
+            )
+
+        bounds = Event.objects.filter(organizer=organizer, search_vector__isnull=True).aggregate(low=Min('id'), high=Max('id'))
+        for start in range(bounds['low'] or 0, (bounds['high'] or -1) + 1, 50_000):
+            update_search_vectors(Event.objects.filter(id__gte=start, id__lt=start + 50_000, search_vector__isnull=True))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Event._meta.db_table}')
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def build_queryset(self, backends, terms):
+        view = EventViewSet(action_map={'get': 'list'}, format_kwarg=None)
+        request = view.initialize_request(self.factory.get('/api/events/', {'search': terms}))
+        view.request = request
+
+        queryset = view.get_queryset()
+        for backend in backends:
+            queryset = backend().filter_queryset(request, queryset, view)
+        return queryset
+
+    def measure(self, backends, terms, runs, explain):
+        timings = []
+        for _ in range(runs):
+            queryset = self.build_queryset(backends, terms)
+            started = time.perf_counter()
+            count = queryset.count()
+            list(queryset[:10])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        if explain:
+            self.stdout.write(self.build_queryset(backends, terms)[:10].explain(analyze=True))
+        return count, timings
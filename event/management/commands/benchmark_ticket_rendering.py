@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+import qrcode
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from event.models import Event, Order, OrderItem, Ticket
+from event.utils import _ticket_lines, render_ticket_pdf
+from user.models import User
+
+
+def legacy_ticket_pdf(order_item, tickets_dir):
+    """The renderer before in-memory rendering: a QR PNG on disk, read back by drawImage."""
+    file_path = os.path.join(tickets_dir, f"ticket_{order_item.id}.pdf")
+    c = canvas.Canvas(file_path, pagesize=A4)
+    width, height = A4
+
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(200, height - 100, "✓ iTicket - Event Ticket")
+    c.setFont("Helvetica", 14)
+    for offset, text in _ticket_lines(order_item):
+        c.drawString(100, height - offset, text)
+    c.setFont("Helvetica-Oblique", 12)
+    c.drawString(100, height - 570, "Please bring this ticket to the event entrance.")
+
+    qr_data = f"TicketID:{order_item.id}|Order:{order_item.order.id}|User:{order_item.order.customer.username}|UUID:{uuid.uuid4()}"
+    qr = qrcode.make(qr_data)
+    qr_path = os.path.join(tickets_dir, f"qr_{order_item.id}.png")
+    qr.save(qr_path)
+    c.drawImage(qr_path, 100, 100, 150, 150)
+
+    c.showPage()
+    c.save()
+    return file_path
+
+
+class Command(BaseCommand):
+    help = 'Measures tickets/second for the PNG-on-disk ticket renderer and the in-memory vector QR renderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=200)
+
+    def handle(self, *args, **options):
+        # Unsaved instances: rendering needs no database.
+        event = Event(id=1, title='Baku Jazz Festival', venue='Baku Crystal Hall', date=timezone.now() + timedelta(days=7))
+        ticket = Ticket(id=1, event=event, name='VIP', price=Decimal('120.00'))
+        order = Order(id=1, customer=User(username='benchmark'), status=Order.OrderStatus.CONFIRMED)
+        order_items = [OrderItem(id=index, order=order, ticket=ticket, quantity=2, price=ticket.price) for index in range(1, options['tickets'] + 1)]
+
+        tickets_dir = tempfile.mkdtemp()
+        try:
+            results = [
+                ('png + files', lambda item: os.path.getsize(legacy_ticket_pdf(item, tickets_dir))),
+                ('vector, in memory', lambda item: len(render_ticket_pdf(item))),
+            ]
+            self.stdout.write(f'{"renderer":<20}{"tickets/s":>11}{"ms/ticket":>11}{"avg KB":>9}')
+            for name, render in results:
+                render(order_items[0])
+                started = time.perf_counter()
+                sizes = [render(item) for item in order_items]
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name:<20}{len(order_items) / elapsed:>11.1f}{elapsed * 1000 / len(order_items):>11.2f}'
+                    f'{sum(sizes) / len(sizes) / 1024:>9.1f}'
+                )
+        finally:
+            shutil.rmtree(tickets_dir)
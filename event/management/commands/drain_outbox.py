@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from event.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Sends queued outbox emails in batches, one mail backend connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and poll every N seconds once the outbox is empty, instead of draining it once.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            claimed, sent = drain_outbox(batch_size=options['batch_size'])
+            if claimed:
+                self.stdout.write(f'Sent {sent} of {claimed} outbox messages.')
+                continue
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,287 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from urllib import error, request as urlrequest
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+from event.inventory import set_striping
+from event.models import Event, Ticket, Order, OrderItem, Wallet
+from user.models import User, Profile
+
+PASSWORD = 'loadtest-pass-123'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(int(round(pct / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class Recorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint, status, elapsed):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+
+
+class Client:
+
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.token = None
+
+    def call(self, endpoint, method, path, payload=None, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        req = urlrequest.Request(self.base_url + path, data=body, method=method)
+        req.add_header('Content-Type', 'application/json')
+        if self.token:
+            req.add_header('Authorization', f'Bearer {self.token}')
+        for name, value in (headers or {}).items():
+            req.add_header(name, value)
+
+        started = time.perf_counter()
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except error.HTTPError as e:
+            status, content = e.code, e.read()
+        except (error.URLError, OSError):
+            status, content = 0, b''
+        self.recorder.add(endpoint, status, time.perf_counter() - started)
+
+        try:
+            data = json.loads(content) if content else None
+        except ValueError:
+            data = None
+        return status, data
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds customers, events and tickets, then replays concurrent '
+        'login -> browse -> buy -> confirm flows against a running server '
+        'and reports latency, throughput, errors and stock/wallet consistency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=3, help='Purchase flows per user.')
+        parser.add_argument('--events', type=int, default=5)
+        parser.add_argument('--tickets-per-event', type=int, default=3)
+        parser.add_argument('--stock', type=int, default=100, help='Initial quantity of every ticket.')
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--balance', type=Decimal, default=Decimal('100000.00'))
+        parser.add_argument('--stripes', type=int, default=0, help='Stripe every ticket over N counters.')
+        parser.add_argument('--admission-rate', type=int, default=None, help='Put events behind a waiting room.')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data after the run.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        run = uuid.uuid4().hex[:8]
+        self.stdout.write(f'Seeding load test run {run}...')
+        organizer, users, tickets = self.seed(run)
+
+        self.recorder = Recorder()
+        self.event_ids = sorted({ticket.event_id for ticket in tickets})
+        self.stdout.write(
+            f'Running {len(users)} users x {options["iterations"]} flows '
+            f'with {options["concurrency"]} workers against {options["base_url"]}...'
+        )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(self.user_flow, users))
+        elapsed = time.perf_counter() - started
+
+        self.report(elapsed)
+        ok = self.check_consistency(users, tickets)
+
+        if not options['keep']:
+            User.objects.filter(username__startswith=f'loadtest-{run}-').delete()
+            organizer.delete()
+
+        if not ok:
+            raise CommandError('Consistency checks failed')
+
+    def seed(self, run):
+        options = self.options
+        password = make_password(PASSWORD)
+
+        organizer = User.objects.create(
+            username=f'loadtest-org-{run}', email=f'loadtest-org-{run}@example.com', role=User.Role.ORGANIZER,
+        )
+        users = User.objects.bulk_create([
+            User(
+                username=f'loadtest-{run}-{i}',
+                email=f'loadtest-{run}-{i}@example.com',
+                password=password,
+                role=User.Role.CUSTOMER,
+                is_active=True,
+                email_verified=True,
+            )
+            for i in range(options['users'])
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        Wallet.objects.bulk_create([Wallet(user=user, balance=options['balance']) for user in users])
+
+        events = Event.objects.bulk_create([
+            Event(
+                title=f'Load test {run} #{i}',
+                venue='Load test arena',
+                date=timezone.now() + timedelta(days=7 + i),
+                organizer=organizer,
+                admission_rate=options['admission_rate'],
+            )
+            for i in range(options['events'])
+        ])
+        tickets = Ticket.objects.bulk_create([
+            Ticket(
+                event=event,
+                name=f'Tier {i}',
+                price=Decimal(10 * (i + 1)),
+                quantity_avaible=options['stock'],
+            )
+            for event in events
+            for i in range(options['tickets_per_event'])
+        ])
+
+        if options['stripes']:
+            for ticket in tickets:
+                set_striping(ticket, options['stripes'])
+
+        return organizer, users, tickets
+
+    def user_flow(self, user):
+        client = Client(self.options['base_url'], self.recorder, self.options['timeout'])
+        status, data = client.call('login', 'POST', '/auth/login/', {'login': user.username, 'password': PASSWORD})
+        if status != 200:
+            return
+        client.token = data['access']
+
+        for _ in range(self.options['iterations']):
+            client.call('events_list', 'GET', '/api/events/')
+            event_id = random.choice(self.event_ids)
+            status, event = client.call('event_detail', 'GET', f'/api/events/{event_id}/')
+            if status != 200:
+                continue
+
+            available = [ticket for ticket in event['tickets'] if ticket['quantity_avaible'] > 0]
+            if not available:
+                continue
+
+            headers = {}
+            if event.get('admission_rate'):
+                token = self.wait_in_queue(client, event_id)
+                if token is None:
+                    continue
+                headers['X-Queue-Token'] = token
+
+            basket = [{
+                'ticket': random.choice(available)['id'],
+                'quantity': random.randint(1, self.options['max_quantity']),
+            }]
+            headers['Idempotency-Key'] = uuid.uuid4().hex
+            status, data = client.call('order_create', 'POST', '/api/order-items/', basket, headers)
+            if status != 200:
+                continue
+
+            order_id = data['order items'][0]['order']
+            client.call(
+                'order_confirm', 'PATCH', f'/api/orders/{order_id}/', {'status': 'confirmed'},
+                {'Idempotency-Key': uuid.uuid4().hex},
+            )
+
+    def wait_in_queue(self, client, event_id):
+        status, data = client.call('queue_join', 'POST', f'/api/events/{event_id}/queue/')
+        if status != 201:
+            return None
+
+        deadline = time.monotonic() + self.options['timeout'] * 10
+        while not data['admitted'] and time.monotonic() < deadline:
+            time.sleep(min(max(data['estimated_wait'], 0.5), 5))
+            status, polled = client.call('queue_status', 'GET', f'/api/queue/status/?token={data["token"]}')
+            if status == 200:
+                data = {**data, **polled}
+        return data['token'] if data['admitted'] else None
+
+    def report(self, elapsed):
+        header = f'{"endpoint":<15}{"requests":>9}{"rps":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"4xx":>7}{"5xx":>7}{"failed":>8}'
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        total = 0
+        for endpoint, latencies in self.recorder.latencies.items():
+            statuses = self.recorder.statuses[endpoint]
+            total += len(latencies)
+            client_errors = sum(count for code, count in statuses.items() if 400 <= code < 500)
+            server_errors = sum(count for code, count in statuses.items() if code >= 500)
+            self.stdout.write(
+                f'{endpoint:<15}{len(latencies):>9}{len(latencies) / elapsed:>9.1f}'
+                f'{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 95) * 1000:>9.1f}'
+                f'{percentile(latencies, 99) * 1000:>9.1f}{client_errors:>7}{server_errors:>7}{statuses.get(0, 0):>8}'
+            )
+            if statuses.get(429):
+                self.stdout.write(self.style.WARNING(
+                    f'  {statuses[429]} throttled responses; raise THROTTLE_USER_RATE/THROTTLE_ANON_RATE on the server.'
+                ))
+
+        self.stdout.write('-' * len(header))
+        self.stdout.write(f'{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)')
+
+    def check_consistency(self, users, tickets):
+        ok = True
+        held = dict(
+            OrderItem.objects
+            .filter(ticket__in=tickets, order__status__in=[Order.OrderStatus.PENDING, Order.OrderStatus.CONFIRMED])
+            .values('ticket')
+            .annotate(total=Sum('quantity'))
+            .values_list('ticket', 'total')
+        )
+        oversold = drifted = 0
+        for ticket in Ticket.objects.with_available().filter(id__in=[ticket.id for ticket in tickets]):
+            sold = held.get(ticket.id, 0)
+            if sold > self.options['stock'] or ticket.available < 0:
+                oversold += 1
+            if sold + ticket.available != self.options['stock']:
+                drifted += 1
+                self.stdout.write(self.style.ERROR(
+                    f'  ticket {ticket.id}: {sold} sold + {ticket.available} left != {self.options["stock"]}'
+                ))
+
+        wallets_off = 0
+        spent = defaultdict(Decimal)
+        for order in Order.objects.filter(customer__in=users, status=Order.OrderStatus.CONFIRMED).prefetch_related('orderitems'):
+            spent[order.customer_id] += order.final_price or order.total_price or Decimal('0.00')
+        for wallet in Wallet.objects.filter(user__in=users):
+            if wallet.balance != self.options['balance'] - spent[wallet.user_id] or wallet.balance < 0:
+                wallets_off += 1
+
+        sold_total = sum(held.values())
+        self.stdout.write(f'Tickets sold: {sold_total} of {self.options["stock"] * len(tickets)}')
+        for label, count in [('Oversold tickets', oversold), ('Stock drift', drifted), ('Wallet mismatches', wallets_off)]:
+            style = self.style.SUCCESS if count == 0 else self.style.ERROR
+            self.stdout.write(style(f'{label}: {count}'))
+            ok = ok and count == 0
+        return ok
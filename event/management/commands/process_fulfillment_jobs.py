@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from event.fulfillment import process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Renders and emails the tickets of confirmed orders from the fulfillment queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Threads rendering and sending each batch.')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and poll every N seconds once the queue is empty, instead of draining it once.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            claimed, delivered = process_jobs(batch_size=options['batch_size'], workers=options['workers'])
+            if claimed:
+                self.stdout.write(f'Delivered {delivered} of {claimed} fulfillment jobs.')
+                continue
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
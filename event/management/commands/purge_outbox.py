@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from event.outbox import purge_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deletes sent and dead outbox messages older than OUTBOX_RETENTION_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        purged = purge_outbox(batch_size=options['batch_size'])
+        self.stdout.write(f'Purged {purged} outbox messages.')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from event.utils import purge_stale_pdfs
+
+
+class Command(BaseCommand):
+    help = 'Deletes ticket and order PDFs that a newer rendering replaced more than --grace-minutes ago.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60)
+
+    def handle(self, *args, **options):
+        purged = purge_stale_pdfs(options['grace_minutes'] * 60)
+        self.stdout.write(f'Purged {purged} stale PDFs.')
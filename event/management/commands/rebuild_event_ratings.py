@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from event.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Event.rating_sum and Event.rating_count from the reviews table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        last_id = Event.objects.aggregate(last=Max('id'))['last'] or 0
+        batch_size = options['batch_size']
+        updated = 0
+
+        for start in range(0, last_id, batch_size):
+            updated += Event.objects.filter(id__gt=start, id__lte=start + batch_size).rebuild_ratings()
+
+        self.stdout.write(f'Rebuilt ratings for {updated} events.')
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from event.inventory import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Returns the stock of expired ticket holds and cancels their pending orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and sweep every N seconds instead of once.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_holds(batch_size=options['batch_size'])
+            if released or not options['interval']:
+                self.stdout.write(f'Released {released} expired holds.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
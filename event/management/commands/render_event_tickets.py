@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from event.models import Event, Order
+from event.utils import orders_for_rendering, render_order_pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders the order PDF of every confirmed order holding tickets for an event, e.g. after the '
+        'event changed. Orders whose current PDF is already cached are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--workers', type=int, default=None, help='Render processes (default TICKET_RENDER_WORKERS).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders loaded and rendered per batch.')
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event {options["event_id"]} does not exist.')
+
+        order_ids = list(
+            Order.objects
+            .filter(status=Order.OrderStatus.CONFIRMED, orderitems__ticket__event=event)
+            .distinct()
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        started = time.perf_counter()
+        rendered = 0
+        for start in range(0, len(order_ids), options['batch_size']):
+            orders = orders_for_rendering(Order.objects.filter(id__in=order_ids[start:start + options['batch_size']]))
+            rendered += render_order_pdfs(orders, workers=options['workers'])[1]
+        self.stdout.write(
+            f'Rendered {rendered} order PDFs for "{event.title}" in {time.perf_counter() - started:.1f}s '
+            f'({len(order_ids) - rendered} already cached).'
+        )
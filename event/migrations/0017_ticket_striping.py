@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0016_tickethold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='stripe_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TicketStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('quantity_avaible', models.PositiveIntegerField(default=0)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stripes', to='event.ticket')),
+            ],
+            options={
+                'unique_together': {('ticket', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0017_ticket_striping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='admission_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Buyers let through the waiting room per minute. Empty means no waiting room.', null=True),
+        ),
+    ]
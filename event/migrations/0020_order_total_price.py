@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:34
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_price(apps, schema_editor):
+    Order = apps.get_model('event', 'Order')
+    OrderItem = apps.get_model('event', 'OrderItem')
+
+    totals = (
+        OrderItem.objects
+        .filter(order=models.OuterRef('pk'))
+        .values('order')
+        .annotate(total=models.Sum(models.F('price') * models.F('quantity')))
+        .values('total')
+    )
+    Order.objects.update(
+        total_price=Coalesce(models.Subquery(totals), Decimal('0.00'), output_field=models.DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0019_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_total_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_search_vector_gin')
+
+SEARCH_CONFIGS = {
+    'EN': 'english',
+    'TR': 'turkish',
+    'RU': 'russian',
+    'AZ': 'simple',
+}
+
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('event', 'Event'), SEARCH_INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('event', 'Event'), SEARCH_INDEX)
+
+
+def backfill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Event = apps.get_model('event', 'Event')
+    Category = apps.get_model('event', 'Category')
+
+    config = models.Case(
+        *[models.When(language=language, then=models.Value(name)) for language, name in SEARCH_CONFIGS.items()],
+        default=models.Value('simple'),
+    )
+    categories = models.Subquery(
+        Category.objects
+        .filter(events=models.OuterRef('pk'))
+        .values('events')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+    Event.objects.update(search_vector=(
+        SearchVector('title', config=config, weight='A')
+        + SearchVector('venue', config=config, weight='B')
+        + SearchVector(categories, config=config, weight='B')
+        + SearchVector('description', config=config, weight='C')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0021_event_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # The GIN index only exists on PostgreSQL; other backends keep the
+        # column (unused) so the schema stays the same everywhere.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='event', index=SEARCH_INDEX)],
+            database_operations=[migrations.RunPython(add_search_index, remove_search_index)],
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
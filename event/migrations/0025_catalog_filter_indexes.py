@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:50
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='event_title_trgm'),
+]
+
+
+def trigram_available(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if not trigram_available(schema_editor):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(apps.get_model('event', 'Event'), index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0024_event_active_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['language', 'date'], name='event_active_lang_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['venue', 'date'], name='event_venue_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date'], name='event_date_idx'),
+        ),
+        # Trigram indexes need the pg_trgm extension; servers without it keep
+        # the (slower) sequential scan for icontains filters.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='event', index=index) for index in TRIGRAM_INDEXES],
+            database_operations=[migrations.RunPython(add_trigram_indexes, remove_trigram_indexes)],
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['price'], name='ticket_price_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0025_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('discount_percentage__gt', 0)), fields=['-discount_percentage', 'id'], name='ticket_discount_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:01
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+PREFIX_INDEXES = [
+    models.Index(django.db.models.functions.comparison.Collate(django.db.models.functions.text.Upper('title'), 'C'), models.F('date'), condition=models.Q(('is_active', True)), name='event_title_prefix_idx'),
+    models.Index(django.db.models.functions.comparison.Collate(django.db.models.functions.text.Upper('venue'), 'C'), models.F('date'), condition=models.Q(('is_active', True)), name='event_venue_prefix_idx'),
+]
+
+
+def add_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in PREFIX_INDEXES:
+        schema_editor.add_index(apps.get_model('event', 'Event'), index)
+
+
+def remove_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0026_ticket_discount_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The "C" collation is PostgreSQL's; other backends fall back to an
+        # unindexed istartswith in event/autocomplete.py.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='event', index=index) for index in PREFIX_INDEXES],
+            database_operations=[migrations.RunPython(add_prefix_indexes, remove_prefix_indexes)],
+        ),
+    ]
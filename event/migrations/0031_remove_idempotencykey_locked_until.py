@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0030_idempotencykey_locked_until'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='idempotencykey',
+            name='locked_until',
+        ),
+    ]
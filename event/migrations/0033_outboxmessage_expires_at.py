@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0032_waiting_room_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
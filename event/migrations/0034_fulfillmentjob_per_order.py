@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def jobs_per_order(apps, schema_editor):
+    # One job per order from now on: keep the least finished job of each
+    # order, so an order with any undelivered item is delivered again.
+    FulfillmentJob = apps.get_model('event', 'FulfillmentJob')
+    rank = {'failed': 0, 'pending': 1, 'running': 2, 'done': 3}
+    kept = {}
+    for job in FulfillmentJob.objects.select_related('order_item').order_by('id'):
+        order_id = job.order_item.order_id
+        current = kept.get(order_id)
+        if current is None or rank[job.status] < rank[current.status]:
+            kept[order_id] = job
+    FulfillmentJob.objects.exclude(pk__in=[job.pk for job in kept.values()]).delete()
+    for order_id, job in kept.items():
+        FulfillmentJob.objects.filter(pk=job.pk).update(order_id=order_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0033_outboxmessage_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fulfillmentjob',
+            name='order',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fulfillment', to='event.order'),
+        ),
+        migrations.RunPython(jobs_per_order, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='fulfillmentjob',
+            name='order_item',
+        ),
+        migrations.AlterField(
+            model_name='fulfillmentjob',
+            name='order',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fulfillment', to='event.order'),
+        ),
+    ]
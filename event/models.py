@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Collate, Now, Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from datetime import timedelta
 from user.models import User
@@ -15,6 +18,63 @@ class Category(models.Model):
         return self.name
 
 
+UPCOMING_DAYS = 31
+
+
+class EventQuerySet(models.QuerySet):
+
+    def upcoming(self, days=UPCOMING_DAYS):
+        return self.filter(is_active=True, date__gt=Now(), date__lt=Now() + timedelta(days=days))
+
+    def next_upcoming_change(self, days=UPCOMING_DAYS):
+        """
+        When the next event leaves the upcoming window (it starts) or enters
+        it (it comes within `days`), or None if nothing is scheduled.
+        """
+        now = timezone.now()
+        window = timedelta(days=days)
+        bounds = self.filter(is_active=True).aggregate(
+            leaves=models.Min('date', filter=models.Q(date__gt=now)),
+            enters=models.Min('date', filter=models.Q(date__gte=now + window)),
+        )
+        changes = [bounds['leaves'], bounds['enters'] and bounds['enters'] - window]
+        return min([change for change in changes if change], default=None)
+
+    def with_ticket_summary(self):
+        """
+        Annotates `price_from` (lowest current or list price), `tickets_left`
+        (stock including stripes) and `sold_out`, each from a correlated
+        subquery so the event rows are not multiplied by their tickets.
+        """
+        if 'tickets_left' in self.query.annotations:
+            return self
+
+        tickets = Ticket.objects.filter(event=models.OuterRef('pk')).order_by().values('event')
+        stripes = TicketStripe.objects.filter(ticket__event=models.OuterRef('pk')).order_by().values('ticket__event')
+        return self.annotate(
+            price_from=models.Subquery(
+                tickets.annotate(low=models.Min(Coalesce('current_price', 'price'))).values('low')
+            ),
+            tickets_left=(
+                Coalesce(models.Subquery(tickets.annotate(total=models.Sum('quantity_avaible')).values('total')), 0)
+                + Coalesce(models.Subquery(stripes.annotate(total=models.Sum('quantity_avaible')).values('total')), 0)
+            ),
+            sold_out=models.Case(
+                models.When(tickets_left__lte=0, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def rebuild_ratings(self):
+        reviews = Review.objects.filter(event=models.OuterRef('pk')).values('event')
+        return self.update(
+            rating_sum=Coalesce(models.Subquery(reviews.annotate(total=models.Sum('rating')).values('total')), 0),
+            rating_count=Coalesce(models.Subquery(reviews.annotate(total=models.Count('id')).values('total')), 0),
+            updated_at=timezone.now(),
+        )
+
+
 class Event(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
@@ -29,20 +89,84 @@ class Event(models.Model):
         ('RU', 'Russian'),
     ], default='EN')
     is_active = models.BooleanField(default=True)
+    admission_rate = models.PositiveIntegerField(null=True, blank=True, help_text='Buyers let through the waiting room per minute. Empty means no waiting room.')
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventQuerySet.as_manager()
+
     class Meta:
-        ...
+        indexes = [
+            GinIndex(fields=['search_vector'], name='event_search_vector_gin'),
+            models.Index(fields=['date'], condition=models.Q(is_active=True), name='event_active_date_idx'),
+            models.Index(fields=['language', 'date'], condition=models.Q(is_active=True), name='event_active_lang_date_idx'),
+            models.Index(fields=['venue', 'date'], name='event_venue_date_idx'),
+            models.Index(fields=['date'], name='event_date_idx'),
+            # title__icontains compiles to UPPER(title) LIKE UPPER(...). Only
+            # created where pg_trgm is available, see migration 0025.
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='event_title_trgm'),
+            # Autocomplete prefix scans, see event/autocomplete.py. PostgreSQL
+            # only (migration 0027).
+            models.Index(
+                Collate(Upper('title'), 'C'), models.F('date'),
+                condition=models.Q(is_active=True), name='event_title_prefix_idx',
+            ),
+            models.Index(
+                Collate(Upper('venue'), 'C'), models.F('date'),
+                condition=models.Q(is_active=True), name='event_venue_prefix_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
     
     def is_recent(self):
         now = timezone.now()
-        return now < self.date < now + timedelta(days=31)
+        return now < self.date < now + timedelta(days=UPCOMING_DAYS)
     
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
 
 
+class TicketQuerySet(models.QuerySet):
+
+    def with_available(self):
+        if 'available' in self.query.annotations:
+            return self
+
+        striped = (
+            TicketStripe.objects
+            .filter(ticket=models.OuterRef('pk'))
+            .values('ticket')
+            .annotate(total=models.Sum('quantity_avaible'))
+            .values('total')
+        )
+        return self.annotate(available=models.Case(
+            models.When(
+                stripe_count__gt=0,
+                then=models.F('quantity_avaible') + Coalesce(models.Subquery(striped), 0),
+            ),
+            default=models.F('quantity_avaible'),
+            output_field=models.PositiveIntegerField(),
+        ))
+
+    def most_discounted(self):
+        """Discounted tickets still on sale for active future events, best discount first."""
+        return (
+            self.with_available()
+            .filter(discount_percentage__gt=0, event__is_active=True, event__date__gt=Now(), available__gt=0)
+            .order_by('-discount_percentage', 'id')
+        )
+
+
 class Ticket(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='tickets')
     name = models.CharField(max_length=100)
@@ -50,13 +174,50 @@ class Ticket(models.Model):
     current_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     discount_percentage = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     quantity_avaible = models.PositiveIntegerField()
+    stripe_count = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TicketQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price'], name='ticket_price_idx'),
+            models.Index(
+                fields=['-discount_percentage', 'id'],
+                condition=models.Q(discount_percentage__gt=0),
+                name='ticket_discount_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.event}, {self.name}"
 
+    def available_quantity(self):
+        if hasattr(self, 'available'):
+            return self.available
+        if not self.stripe_count:
+            return self.quantity_avaible
+        striped = self.stripes.aggregate(total=models.Sum('quantity_avaible'))['total']
+        return self.quantity_avaible + (striped or 0)
+
     def quantity(self):
-        return self.quantity_avaible > 0
+        return self.available_quantity() > 0
+
+
+class TicketStripe(models.Model):
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='stripes')
+    index = models.PositiveSmallIntegerField()
+    quantity_avaible = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('ticket', 'index')
+
+    def __str__(self):
+        return f"{self.ticket} #{self.index}: {self.quantity_avaible}"
     
 
+
 class Order(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
     ticket = models.ManyToManyField(Ticket, related_name='orders', through='OrderItem', blank=True)    
@@ -71,9 +232,14 @@ class Order(models.Model):
     confirmed_at = models.DateTimeField(auto_now=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    @property
-    def total_price(self):
-        return sum(item.price * item.quantity for item in self.orderitems.all())
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+
+    def update_total_price(self):
+        self.total_price = self.orderitems.aggregate(
+            total=Coalesce(models.Sum(models.F('price') * models.F('quantity')), Decimal('0.00'), output_field=models.DecimalField())
+        )['total']
+        Order.objects.filter(pk=self.pk).update(total_price=self.total_price)
+        return self.total_price
     
     
     promo_code = models.ForeignKey('PromoCode', on_delete=models.SET_NULL, null=True, blank=True)
@@ -82,7 +248,7 @@ class Order(models.Model):
 
 
     def apply_promo_instance(self, promo=None):
-        total = self.total_price()
+        total = self.total_price
         discount = (total * promo.discount_percentage) / Decimal('100.00')
         self.discount_amount = discount.quantize(Decimal('0.01'))
         self.promo_code = promo
@@ -99,6 +265,19 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
 
+class TicketHold(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='holds')
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='holds')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.ticket} x {self.quantity} until {self.expires_at}"
+
+    def is_expired(self):
+        return timezone.now() >= self.expires_at
+
+
 class PromoCode(models.Model):
     code = models.CharField(max_length=50, unique=True)
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2)
@@ -170,4 +349,79 @@ class Review(models.Model):
         unique_together = ('event', 'user')
 
     def __str__(self):
-        return f"{self.user.username} - {self.event.title} - {self.rating}"
\ No newline at end of file
+        return f"{self.user.username} - {self.event.title} - {self.rating}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+class FulfillmentJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='fulfillment')
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after'], condition=models.Q(status='pending'), name='fulfillment_pending_idx'),
+            models.Index(fields=['locked_until'], condition=models.Q(status='running'), name='fulfillment_running_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.status}"
+
+
+class OutboxMessage(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        DEAD = 'dead', 'Dead'
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    # [{'filename', 'content' (base64), 'mimetype'}]
+    attachments = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Messages that are useless late (one-time codes) go dead after this.
+    expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after'], condition=models.Q(status='pending'), name='outbox_pending_idx'),
+            models.Index(fields=['locked_until'], condition=models.Q(status='sending'), name='outbox_sending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
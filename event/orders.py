@@ -0,0 +1,44 @@
+from django.db import transaction
+from rest_framework import serializers
+from .inventory import reserve_tickets, hold_tickets
+from .models import Order, OrderItem, Ticket
+
+
+def load_tickets(lines):
+    ticket_ids = {line['ticket'] for line in lines}
+    tickets = Ticket.objects.select_related('event').in_bulk(ticket_ids)
+
+    missing = sorted(ticket_ids - set(tickets))
+    if missing:
+        raise serializers.ValidationError({'ticket': [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]})
+    return tickets
+
+
+def place_order(customer, lines, tickets):
+    """
+    Creates a pending order for `lines` ([{'ticket': id, 'quantity': n}]) in
+    a fixed number of queries: one stock UPDATE for the whole basket, one
+    INSERT for the order, one bulk INSERT each for its items and holds.
+    """
+    quantities = {}
+    order_items = []
+    total_price = 0
+    total_cost = 0
+
+    for line in lines:
+        ticket = tickets[line['ticket']]
+        quantity = line['quantity']
+        quantities[ticket.id] = quantities.get(ticket.id, 0) + quantity
+        order_items.append(OrderItem(ticket=ticket, quantity=quantity, price=ticket.price))
+        total_price += ticket.price * quantity
+        total_cost += (ticket.current_price or ticket.price) * quantity
+
+    with transaction.atomic():
+        reserve_tickets(quantities)
+        order = Order.objects.create(customer=customer, total_price=total_price)
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        hold_tickets(order, quantities)
+
+    return order, order_items, total_cost
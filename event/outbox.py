@@ -0,0 +1,173 @@
+import base64
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = timedelta(hours=6)
+
+
+def enqueue_email(email, expires_at=None):
+    """
+    Stores `email` (an EmailMessage) for `drain_outbox`. Called inside the
+    caller's transaction, the message is only sent if that commits. It is
+    not sent after `expires_at`.
+    """
+    return OutboxMessage.objects.create(
+        expires_at=expires_at,
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or '',
+        to=list(email.to),
+        attachments=[
+            {
+                'filename': filename,
+                'content': base64.b64encode(content.encode() if isinstance(content, str) else content).decode(),
+                'mimetype': mimetype,
+            }
+            for filename, content, mimetype in email.attachments
+        ],
+    )
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None, expires_at=None):
+    return enqueue_email(EmailMessage(subject, message, from_email, recipient_list), expires_at)
+
+
+def _email(message):
+    email = EmailMessage(message.subject, message.body, message.from_email or None, message.to)
+    for attachment in message.attachments:
+        email.attach(attachment['filename'], base64.b64decode(attachment['content']), attachment['mimetype'])
+    return email
+
+
+def retry_delay(attempts):
+    return min(timedelta(seconds=settings.OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)), MAX_BACKOFF)
+
+
+def claim_messages(batch_size, now=None):
+    """
+    Leases up to `batch_size` due messages, oldest first. Each message's
+    `locked_until` fences its outcome updates.
+    """
+    now = now or timezone.now()
+    lease = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OutboxMessage.Status.PENDING, run_after__lte=now)
+                | Q(status=OutboxMessage.Status.SENDING, locked_until__lte=now)
+            )
+            .order_by('run_after')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboxMessage.objects.filter(id__in=ids).update(
+            status=OutboxMessage.Status.SENDING, attempts=F('attempts') + 1, locked_until=lease,
+        )
+    return list(OutboxMessage.objects.filter(id__in=ids).order_by('run_after'))
+
+
+def _renew(message):
+    """
+    Restarts the message's lease just before it is sent, so the tail of a
+    slow batch is not re-claimed by another drainer. False if that already
+    happened.
+    """
+    lease = timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    renewed = OutboxMessage.objects.filter(
+        pk=message.pk, status=OutboxMessage.Status.SENDING, locked_until=message.locked_until,
+    ).update(locked_until=lease)
+    message.locked_until = lease
+    return renewed == 1
+
+
+def _owned(message):
+    # Outcome updates are fenced by the message's current lease.
+    return OutboxMessage.objects.filter(
+        pk=message.pk, status=OutboxMessage.Status.SENDING, locked_until=message.locked_until,
+    )
+
+
+def _failed(message, error):
+    fields = {'last_error': error, 'locked_until': None}
+    if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        fields['status'] = OutboxMessage.Status.DEAD
+    else:
+        fields['status'] = OutboxMessage.Status.PENDING
+        fields['run_after'] = timezone.now() + retry_delay(message.attempts)
+    _owned(message).update(**fields)
+
+
+def drain_outbox(batch_size=100, now=None):
+    """
+    Sends one batch over a single backend connection. Returns (claimed,
+    sent). Failed messages retry with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS or their `expires_at`, then stay `dead` for
+    inspection until `purge_outbox`.
+    """
+    messages = claim_messages(batch_size, now)
+    if not messages:
+        return 0, 0
+
+    sent = 0
+    pending = list(messages)
+    try:
+        with get_connection() as connection:
+            # One message per call on the open connection: a rejected
+            # recipient fails only its own message, and each delivery is
+            # recorded as soon as it happens.
+            while pending:
+                message = pending.pop(0)
+                if message.attempts > settings.OUTBOX_MAX_ATTEMPTS:
+                    _failed(message, 'Worker lease expired on the last attempt')
+                    continue
+                if message.expires_at and message.expires_at <= timezone.now():
+                    _owned(message).update(
+                        status=OutboxMessage.Status.DEAD, locked_until=None, last_error='Expired before it could be sent',
+                    )
+                    continue
+                if not _renew(message):
+                    continue
+                try:
+                    connection.send_messages([_email(message)])
+                except Exception as exc:
+                    logger.exception('Sending outbox message %s failed (attempt %s)', message.pk, message.attempts)
+                    _failed(message, f'{type(exc).__name__}: {exc}')
+                else:
+                    _owned(message).update(
+                        status=OutboxMessage.Status.SENT, sent_at=timezone.now(), locked_until=None, last_error='',
+                    )
+                    sent += 1
+    except Exception as exc:
+        # Opening or closing the connection failed: nothing after the last
+        # delivered message went out.
+        logger.exception('Outbox connection failed')
+        for message in pending:
+            _failed(message, f'{type(exc).__name__}: {exc}')
+    return len(messages), sent
+
+
+def purge_outbox(now=None, batch_size=1000):
+    """
+    Deletes sent and dead messages older than OUTBOX_RETENTION_DAYS. Their
+    bodies hold one-time codes and their attachments whole ticket PDFs.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    finished = OutboxMessage.objects.filter(
+        Q(status=OutboxMessage.Status.SENT, sent_at__lte=cutoff)
+        | Q(status=OutboxMessage.Status.DEAD, created_at__lte=cutoff)
+    )
+    purged = 0
+    while True:
+        ids = list(finished.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += OutboxMessage.objects.filter(id__in=ids).delete()[0]
@@ -1,7 +1,149 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-class CustomPageNumberPagination(PageNumberPagination):
+
+class KeysetPaginationMixin:
+    """
+    Opt-in keyset pagination for page-number paginators. Requests that send
+    `?cursor=` (empty for the first page) are paged by the active ordering
+    plus `pk` as a tie-breaker, without COUNT(*) or OFFSET. NULLs sort last in
+    both directions.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # A sliced queryset (a bounded top-K) cannot take the keyset filter,
+        # so it keeps page numbers.
+        self.use_keyset = self.cursor_query_param in request.query_params and not queryset.query.is_sliced
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self._get_keys(queryset)
+
+        values, reverse = self._decode_cursor(request.query_params[self.cursor_query_param])
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_values = self._values(rows[-1]) if rows and (has_more or reverse) else None
+        self.previous_values = self._values(rows[0]) if rows and (values is not None and (not reverse or has_more)) else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self._link(self.next_values, reverse=False)),
+            ('previous', self._link(self.previous_values, reverse=True)),
+            ('results', data),
+        ]))
+
+    def _get_keys(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        keys = []
+        for term in ordering:
+            if isinstance(term, OrderBy):
+                name, descending = term.expression.name, term.descending
+            else:
+                name, descending = term.lstrip('-'), term.startswith('-')
+            name = 'pk' if name in ('pk', queryset.model._meta.pk.name) else name
+            keys.append((name, descending, self._is_nullable(queryset.model, name)))
+            if name == 'pk':
+                return keys
+        keys.append(('pk', False, False))
+        return keys
+
+    def _is_nullable(self, model, name):
+        if name == 'pk':
+            return False
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return field.null
+
+    def _order_by(self, reverse):
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        ordering = []
+        for name, descending, _ in self.keys:
+            if descending != reverse:
+                ordering.append(F(name).desc(**nulls))
+            else:
+                ordering.append(F(name).asc(**nulls))
+        return ordering
+
+    def _after(self, values, reverse):
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending, nullable), value in zip(self.keys, values):
+            forward = descending == reverse
+            if value is None:
+                after = Q(**{f'{name}__isnull': False}) if reverse else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__{"gt" if forward else "lt"}': value})
+                if nullable and not reverse:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def _values(self, row):
+        values = []
+        for name, _, _ in self.keys:
+            value = row
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def _decode_cursor(self, encoded):
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _link(self, values, reverse):
+        if values is None:
+            return None
+        payload = json.dumps({'v': values, 'r': int(reverse)}, default=str, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+
+class CustomPageNumberPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 20
-    page_query_param = 'page'
\ No newline at end of file
+    page_query_param = 'page'
+
+
+class TicketPageNumberPagination(KeysetPaginationMixin, PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
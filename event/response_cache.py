@@ -0,0 +1,111 @@
+import hashlib
+import uuid
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+from .conditional import content_etag
+
+
+def _cache():
+    return caches[settings.CATALOG_CACHE]
+
+
+def _tag_key(tag):
+    return f'catalog-tag:{tag}'
+
+
+def _bump(tags):
+    _cache().set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+
+
+def invalidate(*tags):
+    """
+    Drops every cached response carrying one of `tags`. The tags are bumped
+    right away and again on commit, so responses rendered from data read
+    inside the writing transaction do not survive it either.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def ticket_tags(ticket_ids):
+    return ['ticket', *[f'ticket:{ticket_id}' for ticket_id in ticket_ids]]
+
+
+def _versions(tags):
+    cache = _cache()
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _response_key(request, view):
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    lookup = view.kwargs.get(view.lookup_url_kwarg or view.lookup_field, '')
+    raw = f'{request.get_host()}|{view.basename}|{view.action}|{lookup}|{urlencode(params)}'
+    return 'catalog:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Caches `list`/`retrieve` response data per normalized query string.
+    Permissions still run on every request; only the handler is skipped.
+    Entries are tagged with `cache_tag` (or `<cache_tag>:<pk>` for detail
+    views) plus `cache_depends_on` and `get_response_cache_tags()`, see
+    `invalidate()`.
+    """
+    cache_tag = None
+    cache_depends_on = []
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_tags(self):
+        if self.action == 'retrieve':
+            return [f'{self.cache_tag}:{self.kwargs[self.lookup_url_kwarg or self.lookup_field]}', *self.cache_depends_on]
+        return [self.cache_tag, *self.cache_depends_on]
+
+    def get_response_cache_tags(self, data):
+        return []
+
+    def get_cache_timeout(self):
+        return settings.CATALOG_CACHE_TIMEOUT
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = _cache()
+        key = _response_key(request, self)
+
+        entry = cache.get(key)
+        if entry is not None and _versions(entry['tags']) == entry['versions']:
+            return Response(entry['data'], headers={'ETag': entry['etag']})
+
+        # Versions are read before the handler runs so that a write landing
+        # mid-request leaves the entry already stale.
+        tags = self.get_cache_tags()
+        versions = _versions(tags)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            extra = self.get_response_cache_tags(response.data)
+            cache.set(
+                key,
+                {
+                    'tags': tags + extra,
+                    'versions': versions + _versions(extra),
+                    'data': response.data,
+                    'etag': content_etag(response.data),
+                },
+                self.get_cache_timeout(),
+            )
+        return response
@@ -0,0 +1,78 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast
+from .models import Category
+
+# Text search configuration per Event.language. Postgres ships no Azerbaijani
+# stemmer, so AZ events are indexed without stemming.
+SEARCH_CONFIGS = {
+    'EN': 'english',
+    'TR': 'turkish',
+    'RU': 'russian',
+    'AZ': 'simple',
+}
+DEFAULT_CONFIG = 'simple'
+
+
+def is_supported(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _config():
+    return Case(
+        *[When(language=language, then=Value(config)) for language, config in SEARCH_CONFIGS.items()],
+        default=Value(DEFAULT_CONFIG),
+    )
+
+
+def _category_names():
+    return Subquery(
+        Category.objects
+        .filter(events=OuterRef('pk'))
+        .values('events')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def search_vector():
+    config = _config()
+    return (
+        SearchVector('title', config=config, weight='A')
+        + SearchVector('venue', config=config, weight='B')
+        + SearchVector(_category_names(), config=config, weight='B')
+        + SearchVector('description', config=config, weight='C')
+    )
+
+
+def update_search_vectors(queryset):
+    if not is_supported(queryset):
+        return 0
+    return queryset.update(search_vector=search_vector())
+
+
+def search_events(queryset, terms):
+    """
+    Filters `queryset` to events matching `terms` and annotates `search_rank`.
+    Each language is matched with its own constant tsquery so the GIN index on
+    `search_vector` can serve every branch.
+    """
+    matches = Q()
+    ranks = []
+    languages = list(SEARCH_CONFIGS.items())
+
+    for language, config in languages:
+        query = SearchQuery(terms, config=config, search_type='websearch')
+        matches |= Q(language=language, search_vector=query)
+        ranks.append(When(language=language, then=SearchRank(F('search_vector'), query)))
+
+    fallback = SearchQuery(terms, config=DEFAULT_CONFIG, search_type='websearch')
+    matches |= Q(search_vector=fallback) & ~Q(language__in=[language for language, _ in languages])
+
+    # ts_rank returns real; cast so the rank survives a round trip through
+    # a pagination cursor unchanged.
+    return queryset.filter(matches).annotate(
+        search_rank=Cast(Case(*ranks, default=SearchRank(F('search_vector'), fallback)), FloatField())
+    )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Event, Ticket, Category, OrderItem, Order, PromoCode, Review
-from django.db.models import Avg
+from .inventory import set_striping
 
 
 class EventNestedSerializer(serializers.ModelSerializer):
@@ -49,7 +49,32 @@ class TicketModelSerializer (serializers. ModelSerializer):
             'current_price',
             'discount_percentage',
             'quantity_avaible',
+            'stripe_count',
         ]
+        read_only_fields = ['stripe_count']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['quantity_avaible'] = instance.available_quantity()
+        return data
+
+    def update(self, instance, validated_data):
+        # Only write the submitted columns so a stale quantity_avaible never
+        # overwrites concurrent purchases.
+        quantity = validated_data.pop('quantity_avaible', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+
+        if quantity is not None:
+            if instance.stripe_count:
+                set_striping(instance, instance.stripe_count, total=quantity)
+            else:
+                instance.quantity_avaible = quantity
+                instance.save(update_fields=['quantity_avaible', 'updated_at'])
+        instance.__dict__.pop('available', None)
+        return instance
 
 
 class CategoryModelSerializer (serializers. ModelSerializer):
@@ -60,15 +85,23 @@ class CategoryModelSerializer (serializers. ModelSerializer):
 
 class EventListModelSerializer (serializers. ModelSerializer):
     average_rating = serializers.SerializerMethodField()
+    price_from = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    tickets_left = serializers.IntegerField(read_only=True)
+    sold_out = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Event
-        fields = ['id', 'title', 'date', 'venue', 'language', 'average_rating']
+        fields = ['id', 'title', 'date', 'venue', 'language', 'average_rating', 'price_from', 'tickets_left', 'sold_out']
         read_only_fields = ['id']
 
     def get_average_rating(self, obj):
-        avg = obj.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-        return round(avg, 2) if avg is not None else None
+        return obj.average_rating
+
+
+class EventAutocompleteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Event
+        fields = ['id', 'title', 'venue', 'date']
 
 
 class EventModelSerializer (serializers. ModelSerializer):
@@ -86,7 +119,8 @@ class EventModelSerializer (serializers. ModelSerializer):
                 'is_active',
                 'organizer',
                 'category',
-                'tickets',]
+                'tickets',
+                'admission_rate',]
         
 
 class OrderItemModelSerializer(serializers.ModelSerializer):
@@ -96,35 +130,18 @@ class OrderItemModelSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['id', 'ticket', 'price', 'quantity', 'order']
 
-    def create(self, validated_data):
-        ticket = validated_data['ticket']
-        quantity = validated_data['quantity']
-        order = validated_data['order']
-
-        if ticket.quantity_avaible < quantity:
-            raise serializers.ValidationError(
-                f"Only {ticket.quantity_avaible} tickets available for '{ticket.event} - {ticket.name}' tickets."
-            )
-
-        ticket.quantity_avaible -= quantity
-        ticket.save()
 
-        validated_data['price'] = ticket.price
+class OrderLineSerializer(serializers.Serializer):
+    ticket = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
 
-        order_item = super().create(validated_data)
-
-        return order_item
-    
 
 class OrderModelSerializer(serializers.ModelSerializer):
     orderitems = OrderItemModelSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, coerce_to_string=False)
     final_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     discount_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Order
-        fields = ['id', 'orderitems', 'total_price', 'promo_code', 'discount_amount', 'final_price', 'status', 'ordered_at', 'confirmed_at', 'updated_at', 'customer']
-    
-    def get_total_price(self, obj):
-        return obj.total_price
\ No newline at end of file
+        fields = ['id', 'orderitems', 'total_price', 'promo_code', 'discount_amount', 'final_price', 'status', 'ordered_at', 'confirmed_at', 'updated_at', 'customer']
\ No newline at end of file
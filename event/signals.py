@@ -1,10 +1,17 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
 from .models import Event
 from .models import Ticket
 from .models import Category
 from .models import Wallet
+from .models import Order
+from .models import OrderItem
+from .models import Review
 from django.contrib.auth import get_user_model
+from .search import update_search_vectors
+from .response_cache import invalidate
 
 User = get_user_model()
 
@@ -21,6 +28,30 @@ def inform_about_new_event(sender, instance, created, **kwargs):
         print('New event is updated with title: ', instance.title)
 
 
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_cached_event(sender, instance, **kwargs):
+    invalidate('event', f'event:{instance.pk}')
+
+
+@receiver(post_save, sender=Event)
+def refresh_event_search_vector(sender, instance, **kwargs):
+    update_search_vectors(Event.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Event.category.through)
+def refresh_search_vector_on_category_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate('event', 'category')
+    if reverse:
+        events = Event.objects.filter(pk__in=pk_set) if pk_set else Event.objects.filter(category=instance)
+    else:
+        events = Event.objects.filter(pk=instance.pk)
+    events.update(updated_at=timezone.now())
+    update_search_vectors(events)
+
+
 @receiver(pre_save, sender=Ticket)
 def validate_ticket_price(sender, instance, **kwargs):
     price = instance.price
@@ -34,6 +65,18 @@ def validate_ticket_quantity(sender, instance, **kwargs):
         raise ValueError('Ticket quantity can not be negative')
 
 
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_cached_ticket(sender, instance, **kwargs):
+    invalidate('ticket', f'ticket:{instance.pk}', f'event:{instance.event_id}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_category(sender, instance, **kwargs):
+    invalidate('category')
+
+
 @receiver(post_save, sender=Category)
 def inform_about_new_category(sender, instance, created, **kwargs):
     if created:
@@ -42,7 +85,67 @@ def inform_about_new_category(sender, instance, created, **kwargs):
         print('New category is updated with name: ', instance.name)
         
 
+@receiver(post_save, sender=Category)
+def refresh_search_vector_on_category_rename(sender, instance, created, **kwargs):
+    if not created:
+        Event.objects.filter(category=instance).update(updated_at=timezone.now())
+        update_search_vectors(Event.objects.filter(category=instance))
+
+
+@receiver(pre_delete, sender=Category)
+def touch_events_on_category_delete(sender, instance, **kwargs):
+    # The category's m2m rows are gone by post_delete, so remember its events.
+    instance._event_ids = list(Event.objects.filter(category=instance).values_list('pk', flat=True))
+    Event.objects.filter(pk__in=instance._event_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Category)
+def refresh_search_vector_on_category_delete(sender, instance, **kwargs):
+    update_search_vectors(Event.objects.filter(pk__in=getattr(instance, '_event_ids', [])))
+
+
 @receiver(pre_save, sender=Category)
 def validate_category_name(sender, instance, **kwargs):
     if Category.objects.filter(name=instance.name).exclude(id=instance.id).exists():
-        raise ValueError('Category name already exists')
\ No newline at end of file
+        raise ValueError('Category name already exists')
+
+
+@receiver(post_save, sender=OrderItem)
+def add_item_to_order_total(sender, instance, created, **kwargs):
+    if created:
+        Order.objects.filter(pk=instance.order_id).update(
+            total_price=F('total_price') + instance.price * instance.quantity
+        )
+    else:
+        instance.order.update_total_price()
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_item_from_order_total(sender, instance, **kwargs):
+    Order.objects.filter(pk=instance.order_id).update(
+        total_price=F('total_price') - instance.price * instance.quantity
+    )
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_event_rating(sender, instance, created, **kwargs):
+    invalidate('event')
+    events = Event.objects.filter(pk=instance.event_id)
+    if created:
+        events.update(
+            rating_sum=F('rating_sum') + instance.rating,
+            rating_count=F('rating_count') + 1,
+            updated_at=timezone.now(),
+        )
+    else:
+        events.rebuild_ratings()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_event_rating(sender, instance, **kwargs):
+    invalidate('event')
+    Event.objects.filter(pk=instance.event_id).update(
+        rating_sum=F('rating_sum') - instance.rating,
+        rating_count=F('rating_count') - 1,
+        updated_at=timezone.now(),
+    )
\ No newline at end of file
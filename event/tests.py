@@ -1,3 +1,1110 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
+from io import StringIO
+from django.conf import settings
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from user.models import User
+from .inventory import (
+    reserve_tickets, release_tickets, hold_tickets, lock_order_holds, release_expired_holds, set_striping, InsufficientStock
+)
+from .models import Event, Category, Ticket, Order, OrderItem, TicketHold, Review, FulfillmentJob, OutboxMessage, PromoCode, IdempotencyKey
+from .checks import check_waiting_room_cache
+from .fulfillment import claim_jobs, process_jobs, run_job
+from .outbox import claim_messages, drain_outbox, enqueue_mail, purge_outbox
+from .utils import render_ticket_pdf
 
-# Create your tests here.
+
+def create_event(**kwargs):
+    defaults = {
+        'title': 'Concert',
+        'venue': 'Baku Crystal Hall',
+        'date': timezone.now() + timedelta(days=10),
+    }
+    defaults.update(kwargs)
+    return Event.objects.create(**defaults)
+
+
+def create_customer(username):
+    return User.objects.create(username=username, email=f'{username}@example.com')
+
+
+class InventoryTests(TestCase):
+
+    def setUp(self):
+        self.event = create_event()
+        self.vip = Ticket.objects.create(event=self.event, name='VIP', price=100, quantity_avaible=5)
+        self.standard = Ticket.objects.create(event=self.event, name='Standard', price=20, quantity_avaible=50)
+
+    def test_reserve_basket_in_one_statement(self):
+        with CaptureQueriesContext(connection) as ctx:
+            reserve_tickets({self.vip.id: 2, self.standard.id: 10})
+
+        updates = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        self.vip.refresh_from_db()
+        self.standard.refresh_from_db()
+        self.assertEqual(self.vip.quantity_avaible, 3)
+        self.assertEqual(self.standard.quantity_avaible, 40)
+
+    def test_reserve_basket_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_tickets({self.vip.id: 6, self.standard.id: 10})
+
+        self.assertEqual(ctx.exception.ticket, self.vip)
+        self.vip.refresh_from_db()
+        self.standard.refresh_from_db()
+        self.assertEqual(self.vip.quantity_avaible, 5)
+        self.assertEqual(self.standard.quantity_avaible, 50)
+
+    def test_release_returns_stock(self):
+        reserve_tickets({self.vip.id: 5})
+        release_tickets({self.vip.id: 2})
+
+        self.vip.refresh_from_db()
+        self.assertEqual(self.vip.quantity_avaible, 2)
+
+
+class OrderItemAPITests(TestCase):
+
+    def setUp(self):
+        self.event = create_event()
+        self.tickets = [
+            Ticket.objects.create(event=self.event, name=f'Row {i}', price=10 + i, quantity_avaible=10)
+            for i in range(10)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('basket'))
+
+    def post_basket(self, lines):
+        basket = [{'ticket': ticket.id, 'quantity': 2} for ticket in self.tickets[:lines]]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/order-items/', basket, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_basket(self):
+        _, single = self.post_basket(1)
+        response, full = self.post_basket(10)
+
+        self.assertEqual(single, full)
+        self.assertEqual(len(response.data['order items']), 10)
+        self.assertEqual(response.data['total_spent'], sum(2 * (10 + i) for i in range(10)))
+
+    def test_retry_with_idempotency_key_replays_response(self):
+        basket = [{'ticket': self.tickets[0].id, 'quantity': 1}]
+        first = self.client.post('/api/order-items/', basket, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        retry = self.client.post('/api/order-items/', basket, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        reused = self.client.post(
+            '/api/order-items/', [{'ticket': self.tickets[1].id, 'quantity': 1}], format='json', HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+        self.tickets[0].refresh_from_db()
+        self.assertEqual(self.tickets[0].quantity_avaible, 9)
+
+    def test_retry_after_a_killed_request_runs_once(self):
+        basket = [{'ticket': self.tickets[0].id, 'quantity': 1}]
+        with patch('event.views.place_order', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.client.post('/api/order-items/', basket, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.client.post('/api/order-items/', basket, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        replay = self.client.post('/api/order-items/', basket, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.tickets[0].refresh_from_db()
+        self.assertEqual(self.tickets[0].quantity_avaible, 9)
+
+    def test_order_history_reads_stored_totals(self):
+        self.post_basket(3)
+        self.post_basket(5)
+        order = Order.objects.order_by('id').last()
+        self.assertEqual(order.total_price, sum(2 * (10 + i) for i in range(5)))
+
+        item = order.orderitems.order_by('id').first()
+        item.quantity = 3
+        item.save()
+        order.orderitems.order_by('id').last().delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, sum(2 * (10 + i) for i in range(5)) + 10 - 28)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+        self.assertEqual([o['total_price'] for o in response.json()], [66.0, 102.0])
+
+    def test_unknown_ticket_creates_nothing(self):
+        response = self.client.post('/api/order-items/', [{'ticket': 0, 'quantity': 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/order-items/', [{'ticket': 999999, 'quantity': 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class StripedInventoryTests(TestCase):
+
+    def setUp(self):
+        self.ticket = Ticket.objects.create(event=create_event(), name='General Admission', price=10, quantity_avaible=10)
+        set_striping(self.ticket, 4)
+
+    def available(self):
+        return Ticket.objects.with_available().get(pk=self.ticket.pk).available
+
+    def test_stock_is_spread_over_stripes(self):
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.quantity_avaible, 0)
+        self.assertEqual(sorted(self.ticket.stripes.values_list('quantity_avaible', flat=True)), [2, 2, 3, 3])
+        self.assertEqual(self.available(), 10)
+
+    def test_reserve_falls_back_across_stripes(self):
+        reserve_tickets({self.ticket.id: 9})
+        self.assertEqual(self.available(), 1)
+
+        with self.assertRaises(InsufficientStock):
+            reserve_tickets({self.ticket.id: 2})
+        self.assertEqual(self.available(), 1)
+
+    def test_released_stock_is_counted(self):
+        reserve_tickets({self.ticket.id: 10})
+        release_tickets({self.ticket.id: 3})
+        reserve_tickets({self.ticket.id: 3})
+        self.assertEqual(self.available(), 0)
+
+    def test_api_reports_aggregated_quantity(self):
+        client = APIClient()
+        client.force_authenticate(create_customer('viewer'))
+        reserve_tickets({self.ticket.id: 4})
+
+        response = client.get(f'/api/ticket/{self.ticket.id}/')
+        self.assertEqual(response.data['quantity_avaible'], 6)
+
+        reserve_tickets({self.ticket.id: 6})
+        response = client.get('/api/ticket/', {'quantity': 'true'})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_disabling_striping_folds_stock_back(self):
+        reserve_tickets({self.ticket.id: 3})
+        set_striping(self.ticket, 0)
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.quantity_avaible, 7)
+        self.assertFalse(self.ticket.stripes.exists())
+
+
+class TicketHoldTests(TestCase):
+
+    def setUp(self):
+        self.ticket = Ticket.objects.create(event=create_event(), name='VIP', price=100, quantity_avaible=10)
+        self.customer = create_customer('holder')
+
+    def test_sweeper_releases_expired_holds(self):
+        expired = Order.objects.create(customer=self.customer)
+        active = Order.objects.create(customer=self.customer)
+        reserve_tickets({self.ticket.id: 7})
+        hold_tickets(expired, {self.ticket.id: 4}, minutes=-1)
+        hold_tickets(active, {self.ticket.id: 3})
+
+        self.assertEqual(release_expired_holds(batch_size=1), 1)
+
+        self.ticket.refresh_from_db()
+        expired.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual(self.ticket.quantity_avaible, 7)
+        self.assertEqual(expired.status, Order.OrderStatus.CANCELLED)
+        self.assertEqual(active.status, Order.OrderStatus.PENDING)
+        self.assertEqual(list(TicketHold.objects.values_list('order', flat=True)), [active.id])
+
+    def test_confirming_expired_order_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.post('/api/order-items/', {'ticket': self.ticket.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(customer=self.customer)
+        order.holds.update(expires_at=timezone.now())
+
+        response = client.patch(f'/api/orders/{order.id}/', {'status': 'confirmed'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.ticket.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(self.ticket.quantity_avaible, 10)
+        self.assertEqual(order.status, Order.OrderStatus.CANCELLED)
+
+    def test_sweeper_between_hold_check_and_confirm(self):
+        self.customer.wallet.deposit(500)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        client.post('/api/order-items/', {'ticket': self.ticket.id, 'quantity': 2}, format='json')
+        order = Order.objects.get(customer=self.customer)
+
+        def sweep_first(order):
+            release_expired_holds(now=timezone.now() + timedelta(hours=1))
+            return lock_order_holds(order)
+
+        with patch('event.views.lock_order_holds', side_effect=sweep_first):
+            response = client.patch(f'/api/orders/{order.id}/', {'status': 'confirmed'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.ticket.refresh_from_db()
+        order.refresh_from_db()
+        self.customer.wallet.refresh_from_db()
+        self.assertEqual(self.ticket.quantity_avaible, 10)
+        self.assertEqual(order.status, Order.OrderStatus.CANCELLED)
+        self.assertEqual(self.customer.wallet.balance, 500)
+        self.assertFalse(FulfillmentJob.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FulfillmentTests(TestCase):
+
+    def setUp(self):
+        self.customer = create_customer('fan')
+        self.customer.wallet.deposit(500)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        event = create_event()
+        tickets = [Ticket.objects.create(event=event, name=name, price=50, quantity_avaible=10) for name in ['VIP', 'Standard']]
+        self.client.post('/api/order-items/', [{'ticket': ticket.id} for ticket in tickets], format='json')
+        self.order = Order.objects.get(customer=self.customer)
+
+    def test_confirm_enqueues_one_job_per_order(self):
+        with patch('event.fulfillment.generate_order_pdf') as render:
+            response = self.client.patch(f'/api/orders/{self.order.id}/', {'status': 'confirmed'}, format='json')
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['fulfillment']['status'], 'pending')
+
+        self.assertEqual(process_jobs(), (1, 1))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(drain_outbox(), (1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        [(filename, pdf, mimetype)] = mail.outbox[0].attachments
+        self.assertEqual((filename, mimetype), (f'order_{self.order.id}.pdf', 'application/pdf'))
+        self.assertEqual(pdf_pages(pdf), 2)
+        response = self.client.get(f'/api/orders/{self.order.id}/fulfillment/')
+        self.assertEqual(response.data['status'], 'done')
+
+    def test_failed_jobs_back_off_then_give_up(self):
+        self.client.patch(f'/api/orders/{self.order.id}/', {'status': 'confirmed'}, format='json')
+        job = FulfillmentJob.objects.get()
+
+        with self.settings(FULFILLMENT_MAX_ATTEMPTS=2), \
+                patch('event.fulfillment.send_order_email', side_effect=ConnectionRefusedError('smtp down')):
+            self.assertEqual(process_jobs(), (1, 0))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (FulfillmentJob.Status.PENDING, 1))
+            self.assertIn('smtp down', job.last_error)
+            self.assertEqual(process_jobs(), (0, 0))
+
+            self.assertEqual(process_jobs(now=job.run_after), (1, 0))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (FulfillmentJob.Status.FAILED, 2))
+
+        response = self.client.get(f'/api/orders/{self.order.id}/fulfillment/')
+        self.assertEqual(response.data['status'], 'failed')
+
+    def test_expired_lease_is_claimed_again(self):
+        self.client.patch(f'/api/orders/{self.order.id}/', {'status': 'confirmed'}, format='json')
+        FulfillmentJob.objects.update(
+            status=FulfillmentJob.Status.RUNNING, attempts=1, locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(process_jobs(), (1, 1))
+        self.assertEqual(FulfillmentJob.objects.get().attempts, 2)
+
+    def test_job_taken_over_after_its_lease_is_not_sent_twice(self):
+        self.client.patch(f'/api/orders/{self.order.id}/', {'status': 'confirmed'}, format='json')
+        claimed = claim_jobs(10)
+        # The batch outlived its lease and another worker re-claimed it.
+        FulfillmentJob.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_jobs(), (1, 1))
+
+        self.assertFalse(any(run_job(job) for job in claimed))
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+
+class TicketPDFTests(TestCase):
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=tempfile.mkdtemp()))
+        customer = create_customer('downloader')
+        self.ticket = Ticket.objects.create(event=create_event(), name='VIP', price=50, quantity_avaible=10)
+        order = Order.objects.create(customer=customer, status=Order.OrderStatus.CONFIRMED)
+        self.order_item = OrderItem.objects.create(order=order, ticket=self.ticket, quantity=2, price=50)
+        self.client = APIClient()
+        self.client.force_authenticate(customer)
+        self.url = f'/api/ticket/{self.order_item.id}/pdf/'
+
+    def test_rendered_once_until_the_ticket_changes(self):
+        with patch('event.rendering.draw_qr') as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(first['ETag'], second['ETag'])
+            self.assertEqual(b''.join(second.streaming_content)[:4], b'%PDF')
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+            self.ticket.price = 40
+            self.ticket.save()
+            third = self.client.get(self.url)
+            self.assertEqual(render.call_count, 2)
+            self.assertNotEqual(third['ETag'], first['ETag'])
+        rendered = lambda: sorted(
+            name for name in os.listdir(os.path.join(settings.MEDIA_ROOT, 'tickets'))
+            if name.startswith(f'ticket_{self.order_item.id}_')
+        )
+        # The superseded rendering outlives the grace period a download
+        # that already found it needs, then the sweeper removes it.
+        self.assertEqual(len(rendered()), 2)
+        call_command('purge_stale_pdfs', stdout=StringIO())
+        self.assertEqual(len(rendered()), 2)
+        call_command('purge_stale_pdfs', grace_minutes=0, stdout=StringIO())
+        self.assertEqual(rendered(), [third['ETag'].strip('"') + '.pdf'])
+
+    def test_order_download_reuses_the_fulfillment_rendering(self):
+        promo = PromoCode.objects.create(
+            code='SPRING10', discount_percentage=10,
+            valid_from=timezone.now() - timedelta(days=1), valid_until=timezone.now() + timedelta(days=1),
+        )
+        order = self.order_item.order
+        order.update_total_price()
+        order.apply_promo_instance(promo)
+        FulfillmentJob.objects.create(order=order)
+        self.assertEqual(process_jobs(), (1, 1))
+        tickets_dir = os.path.join(settings.MEDIA_ROOT, 'tickets')
+        emailed = os.listdir(tickets_dir)
+
+        with patch('event.rendering.draw_qr') as render:
+            response = self.client.get(f'/api/orders/{order.id}/pdf/')
+        render.assert_not_called()
+        self.assertEqual([response['ETag'].strip('"') + '.pdf'], emailed)
+        self.assertEqual(os.listdir(tickets_dir), emailed)
+
+    def test_rendering_writes_no_files(self):
+        before = list(os.walk(settings.MEDIA_ROOT))
+        pdf = render_ticket_pdf(self.order_item)
+        self.assertEqual(pdf[:4], b'%PDF')
+        self.assertEqual(list(os.walk(settings.MEDIA_ROOT)), before)
+
+    def test_accel_redirect_offload(self):
+        with self.settings(TICKET_PDF_ACCEL_REDIRECT='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, b'')
+        self.assertRegex(response['X-Accel-Redirect'], rf'^/protected-media/tickets/ticket_{self.order_item.id}_\w+\.pdf$')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="ticket_{self.order_item.id}.pdf"')
+
+
+def pdf_pages(pdf):
+    return len(re.findall(rb'/Type /Page\b(?!s)', pdf))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class OrderPDFTests(TestCase):
+
+    def setUp(self):
+        self.event = create_event()
+        self.tickets = [
+            Ticket.objects.create(event=self.event, name=name, price=50, quantity_avaible=100) for name in ['VIP', 'Standard']
+        ]
+
+    def create_order(self, username, quantities):
+        order = Order.objects.create(customer=create_customer(username), status=Order.OrderStatus.CONFIRMED)
+        for ticket, quantity in zip(self.tickets, quantities):
+            OrderItem.objects.create(order=order, ticket=ticket, quantity=quantity, price=ticket.price)
+        return order
+
+    def test_one_page_per_seat(self):
+        order = self.create_order('family', [3, 1])
+        client = APIClient()
+        client.force_authenticate(order.customer)
+        response = client.get(f'/api/orders/{order.id}/pdf/')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="order_{order.id}.pdf"')
+        self.assertEqual(pdf_pages(b''.join(response.streaming_content)), 4)
+
+        Order.objects.filter(pk=order.pk).update(status=Order.OrderStatus.PENDING)
+        self.assertEqual(client.get(f'/api/orders/{order.id}/pdf/').status_code, 404)
+
+    def test_bulk_render_for_an_event(self):
+        orders = [self.create_order(f'fan{index}', [index % 3 + 1, 1]) for index in range(6)]
+        Order.objects.filter(pk=orders[0].pk).update(status=Order.OrderStatus.CANCELLED)
+        out = StringIO()
+        call_command('render_event_tickets', self.event.id, workers=2, batch_size=4, stdout=out)
+        self.assertIn('Rendered 5 order PDFs', out.getvalue())
+        out = StringIO()
+        call_command('render_event_tickets', self.event.id, stdout=out)
+        self.assertIn('Rendered 0 order PDFs', out.getvalue())
+
+        tickets_dir = os.path.join(settings.MEDIA_ROOT, 'tickets')
+        rendered = {int(name.split('_')[1]): name for name in os.listdir(tickets_dir) if name.startswith('order_')}
+        self.assertEqual({order.pk for order in orders} & set(rendered), {order.pk for order in orders[1:]})
+        for order in orders[1:]:
+            with open(os.path.join(tickets_dir, rendered[order.pk]), 'rb') as pdf:
+                self.assertEqual(pdf_pages(pdf.read()), order.orderitems.aggregate(seats=Sum('quantity'))['seats'])
+
+
+class BouncingBackend(locmem.EmailBackend):
+    connections = 0
+
+    def open(self):
+        BouncingBackend.connections += 1
+
+    def send_messages(self, messages):
+        if any('bounce' in address for message in messages for address in message.to):
+            raise ConnectionRefusedError('recipient rejected')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='event.tests.BouncingBackend', OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        BouncingBackend.connections = 0
+
+    def test_views_enqueue_and_drain_sends_over_one_connection(self):
+        for username in ['first', 'second']:
+            create_customer(username)
+            response = APIClient().post('/auth/password/forgot/', {'email': f'{username}@example.com'}, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(drain_outbox(), (2, 2))
+        self.assertEqual(BouncingBackend.connections, 1)
+        self.assertEqual([message.to for message in mail.outbox], [['first@example.com'], ['second@example.com']])
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.Status.SENT).count(), 2)
+
+    def test_failures_retry_then_dead_letter(self):
+        enqueue_mail('Hello', 'Body', ['ok@example.com'])
+        bounce = enqueue_mail('Hello', 'Body', ['bounce@example.com'])
+
+        self.assertEqual(drain_outbox(), (2, 1))
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), (OutboxMessage.Status.PENDING, 1))
+        self.assertIn('recipient rejected', bounce.last_error)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+        self.assertEqual(drain_outbox(now=bounce.run_after), (1, 0))
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), (OutboxMessage.Status.DEAD, 2))
+        self.assertEqual(drain_outbox(now=timezone.now() + timedelta(days=1)), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_message_taken_over_mid_batch_is_not_sent_twice(self):
+        enqueue_mail('Hello', 'Body', ['ok@example.com'])
+        claimed = claim_messages(10)
+        # The batch outlived its lease and another drainer sent the message.
+        OutboxMessage.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_outbox(), (1, 1))
+
+        with patch('event.outbox.claim_messages', return_value=claimed):
+            self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_expired_messages_are_dead_lettered(self):
+        create_customer('late')
+        APIClient().post('/auth/password/forgot/', {'email': 'late@example.com'}, format='json')
+        code = OutboxMessage.objects.get()
+        self.assertIsNotNone(code.expires_at)
+
+        OutboxMessage.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_outbox(), (1, 0))
+        code.refresh_from_db()
+        self.assertEqual(code.status, OutboxMessage.Status.DEAD)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_purge_keeps_recent_and_unsent_messages(self):
+        old = enqueue_mail('Hello', 'Body', ['old@example.com'])
+        recent = enqueue_mail('Hello', 'Body', ['recent@example.com'])
+        drain_outbox()
+        unsent = enqueue_mail('Hello', 'Body', ['unsent@example.com'])
+        OutboxMessage.objects.filter(pk=old.pk).update(sent_at=timezone.now() - timedelta(days=8))
+
+        self.assertEqual(purge_outbox(), 1)
+        self.assertEqual(set(OutboxMessage.objects.values_list('pk', flat=True)), {recent.pk, unsent.pk})
+
+    def test_rolled_back_transaction_sends_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            enqueue_mail('Hello', 'Body', ['ok@example.com'])
+            raise RuntimeError
+        self.assertEqual(drain_outbox(), (0, 0))
+
+
+class EventRatingTests(TestCase):
+
+    def test_rating_aggregates_follow_reviews(self):
+        event = create_event()
+        first = Review.objects.create(event=event, user=create_customer('critic1'), rating=5)
+        Review.objects.create(event=event, user=create_customer('critic2'), rating=2)
+        event.refresh_from_db()
+        self.assertEqual(event.average_rating, 3.5)
+
+        first.rating = 3
+        first.save()
+        event.refresh_from_db()
+        self.assertEqual(event.average_rating, 2.5)
+
+        first.delete()
+        event.refresh_from_db()
+        self.assertEqual((event.rating_sum, event.rating_count), (2, 1))
+
+        Event.objects.filter(pk=event.pk).update(rating_sum=0, rating_count=0)
+        call_command('rebuild_event_ratings', stdout=StringIO())
+        event.refresh_from_db()
+        self.assertEqual(event.average_rating, 2)
+
+
+class CatalogQueryBudgetTests(TestCase):
+
+    def setUp(self):
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        for i in range(5):
+            event = create_event(title=f'Event {i}')
+            event.category.set(categories)
+            for j in range(4):
+                Ticket.objects.create(event=event, name=f'Tier {j}', price=10 + j, quantity_avaible=5)
+        self.event = event
+        set_striping(event.tickets.first(), 2)
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('browser'))
+
+    def assertQueryBudget(self, budget, url, params=None):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_event_list(self):
+        response = self.assertQueryBudget(2, '/api/events/')
+        self.assertEqual(response.data['count'], 5)
+        self.assertQueryBudget(2, '/api/events/', {'search': 'Category 1', 'ordering': 'title'})
+
+    def test_event_detail(self):
+        # One validator query for the ETag, then the event, categories and tickets.
+        response = self.assertQueryBudget(4, f'/api/events/{self.event.id}/')
+        self.assertEqual(len(response.data['tickets']), 4)
+        self.assertEqual(len(response.data['category']), 3)
+        self.assertEqual(response.data['tickets'][0]['event_title'], self.event.title)
+
+    def test_ticket_list_and_detail(self):
+        response = self.assertQueryBudget(2, '/api/ticket/')
+        self.assertEqual(response.data['count'], 20)
+        self.assertQueryBudget(2, '/api/ticket/', {'quantity': 'true', 'event_id': self.event.id})
+        self.assertQueryBudget(2, f'/api/ticket/{self.event.tickets.first().id}/')
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.event = create_event()
+        for i in range(7):
+            Ticket.objects.create(
+                event=self.event, name=f'Tier {i}', price=10 + i % 3, quantity_avaible=5,
+                current_price=None if i % 2 else 5 + i,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('pager'))
+
+    def walk(self, url, params):
+        names, pages = [], []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append(response)
+            names += [row['name'] for row in response.data['results']]
+            if not response.data['next']:
+                return names, pages
+            response = self.client.get(response.data['next'])
+
+    def test_pages_follow_ordering_with_ties_and_nulls(self):
+        tickets = list(Ticket.objects.order_by('pk'))
+        for ordering in ['price', '-price', 'current_price', '-current_price', 'name']:
+            field = ordering.lstrip('-')
+            present = sorted(
+                [t for t in tickets if getattr(t, field) is not None],
+                key=lambda t: getattr(t, field), reverse=ordering.startswith('-'),
+            )
+            expected = [t.name for t in present] + [t.name for t in tickets if getattr(t, field) is None]
+            names, pages = self.walk('/api/ticket/', {'ordering': ordering, 'cursor': '', 'page_size': 3})
+            self.assertEqual(names, expected, ordering)
+
+            previous = self.client.get(pages[-1].data['previous'])
+            self.assertEqual(previous.data['results'], pages[-2].data['results'], ordering)
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/ticket/', {'cursor': ''})
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/ticket/', {'cursor': 'bm90LWpzb24'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        self.category = Category.objects.create(name='Jazz')
+        self.event = create_event()
+        self.event.category.add(self.category)
+        self.ticket = Ticket.objects.create(event=self.event, name='Standard', price=20, quantity_avaible=10)
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('cached'))
+
+    def test_repeated_reads_skip_the_database(self):
+        first = self.client.get('/api/events/', {'ordering': 'title', 'language': 'EN'})
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/events/?language=EN&ordering=title')
+        self.assertEqual(first.data, second.data)
+
+        with self.assertNumQueries(2):
+            self.client.get('/api/events/', {'ordering': 'date'})
+
+    def test_stock_changes_invalidate_tickets_and_event_detail(self):
+        self.client.get('/api/ticket/')
+        self.client.get(f'/api/events/{self.event.id}/')
+
+        reserve_tickets({self.ticket.id: 3})
+
+        self.assertEqual(self.client.get('/api/ticket/').data['results'][0]['quantity_avaible'], 7)
+        detail = self.client.get(f'/api/events/{self.event.id}/')
+        self.assertEqual(detail.data['tickets'][0]['quantity_avaible'], 7)
+
+    def test_category_rename_invalidates_events(self):
+        self.client.get(f'/api/events/{self.event.id}/')
+        self.client.get('/api/category/')
+
+        self.category.name = 'Blues'
+        self.category.save()
+
+        detail = self.client.get(f'/api/events/{self.event.id}/')
+        self.assertEqual(detail.data['category'][0]['name'], 'Blues')
+        self.assertEqual(self.client.get('/api/category/').data['results'][0]['name'], 'Blues')
+
+
+class UpcomingEventsTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('homepage'))
+
+    def test_rolling_window(self):
+        now = timezone.now()
+        create_event(title='Tomorrow', date=now + timedelta(days=1))
+        create_event(title='Tonight', date=now + timedelta(hours=3))
+        create_event(title='Started', date=now - timedelta(hours=1))
+        create_event(title='Cancelled', date=now + timedelta(days=2), is_active=False)
+        later = create_event(title='Next season', date=now + timedelta(days=40))
+
+        response = self.client.get('/api/events/upcoming/')
+        self.assertEqual([event['title'] for event in response.data['results']], ['Tonight', 'Tomorrow'])
+
+        later.date = now + timedelta(days=5)
+        later.save()
+        response = self.client.get('/api/events/upcoming/')
+        self.assertEqual(
+            [event['title'] for event in response.data['results']], ['Tonight', 'Tomorrow', 'Next season']
+        )
+
+    def test_cache_expires_at_next_window_change(self):
+        now = timezone.now()
+        starts = create_event(date=now + timedelta(hours=2)).date
+        create_event(date=now + timedelta(days=40))
+        self.assertEqual(Event.objects.next_upcoming_change(), starts)
+
+        create_event(date=now + timedelta(days=31, minutes=30))
+        self.assertEqual(Event.objects.next_upcoming_change(), now + timedelta(minutes=30))
+
+
+class EventTicketSummaryTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        self.gala = create_event(title='Gala')
+        Ticket.objects.create(event=self.gala, name='Stalls', price=80, current_price=60, quantity_avaible=3)
+        self.balcony = Ticket.objects.create(event=self.gala, name='Balcony', price=40, quantity_avaible=5)
+        set_striping(self.balcony, 2)
+        gone = create_event(title='Sold out show')
+        Ticket.objects.create(event=gone, name='Standard', price=25, quantity_avaible=0)
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('cards'))
+
+    def cards(self, params=None):
+        response = self.client.get('/api/events/', params or {})
+        return {event['title']: event for event in response.data['results']}
+
+    def test_list_summary(self):
+        cards = self.cards()
+        self.assertEqual(cards['Gala']['price_from'], '40.00')
+        self.assertEqual(cards['Gala']['tickets_left'], 8)
+        self.assertFalse(cards['Gala']['sold_out'])
+        self.assertTrue(cards['Sold out show']['sold_out'])
+
+        reserve_tickets({self.balcony.id: 5})
+        self.assertEqual(self.cards()['Gala']['tickets_left'], 3)
+
+    def test_filters(self):
+        self.assertEqual(list(self.cards({'sold_out': 'true'})), ['Sold out show'])
+        self.assertEqual(list(self.cards({'sold_out': 'false'})), ['Gala'])
+        self.assertEqual(list(self.cards({'price_min': 30})), ['Gala'])
+        self.assertEqual(list(self.cards({'price_max': 30})), ['Sold out show'])
+
+
+class MostDiscountedTicketsTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        event = create_event()
+        past = create_event(date=timezone.now() - timedelta(days=1))
+        hidden = create_event(is_active=False)
+        self.tickets = {}
+        for name, owner, discount, quantity in [
+            ('Half off', event, 50, 5),
+            ('Tenth off', event, 10, 5),
+            ('Full price', event, None, 5),
+            ('Sold out', event, 70, 0),
+            ('Past', past, 80, 5),
+            ('Inactive', hidden, 90, 5),
+        ]:
+            self.tickets[name] = Ticket.objects.create(
+                event=owner, name=name, price=100, discount_percentage=discount, quantity_avaible=quantity,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='promoter', role=User.Role.ORGANIZER))
+
+    def names(self):
+        response = self.client.get('/api/ticket/most_discounted_tickets/')
+        self.assertEqual(response.status_code, 200)
+        return [ticket['name'] for ticket in response.data['results']]
+
+    def test_only_on_sale_tickets_for_upcoming_events(self):
+        self.assertEqual(self.names(), ['Half off', 'Tenth off'])
+
+    def test_ranking_refreshes_when_a_discount_changes(self):
+        self.names()
+        ticket = self.tickets['Tenth off']
+        ticket.discount_percentage = 60
+        ticket.save()
+        self.assertEqual(self.names(), ['Tenth off', 'Half off'])
+
+
+class EventFacetTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        jazz = Category.objects.create(name='Jazz')
+        rock = Category.objects.create(name='Rock')
+        for title, language, venue, categories in [
+            ('A', 'EN', 'Green Theatre', [jazz]),
+            ('B', 'EN', 'Green Theatre', [jazz, rock]),
+            ('C', 'AZ', 'Crystal Hall', [rock]),
+            ('D', 'RU', 'Crystal Hall', []),
+        ]:
+            create_event(title=title, language=language, venue=venue).category.set(categories)
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('browser'))
+
+    def test_counts_follow_filters(self):
+        response = self.client.get('/api/events/facets/')
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            [(row['name'], row['count']) for row in response.data['category']], [('Jazz', 2), ('Rock', 2)]
+        )
+        self.assertEqual(response.data['venue'], [
+            {'value': 'Crystal Hall', 'count': 2}, {'value': 'Green Theatre', 'count': 2},
+        ])
+
+        rock = Category.objects.get(name='Rock')
+        response = self.client.get('/api/events/facets/', {'category': rock.id})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['language'], [{'value': 'AZ', 'count': 1}, {'value': 'EN', 'count': 1}])
+
+    def test_cached_until_an_event_changes(self):
+        self.client.get('/api/events/facets/', {'language': 'EN'})
+        with self.assertNumQueries(0):
+            self.client.get('/api/events/facets/', {'language': 'EN'})
+
+        create_event(title='E', language='EN', venue='Green Theatre')
+        response = self.client.get('/api/events/facets/', {'language': 'EN'})
+        self.assertEqual(response.data['venue'], [{'value': 'Green Theatre', 'count': 3}])
+
+
+class EventAutocompleteTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        now = timezone.now()
+        create_event(title='Jazz Night', venue='Green Theatre', date=now + timedelta(days=2))
+        create_event(title='jazz brunch', venue='Green Theatre', date=now + timedelta(days=1))
+        create_event(title='Rock Night', venue='Jazz Center', date=now + timedelta(days=3))
+        create_event(title='Jazz Classics', date=now - timedelta(days=1))
+        create_event(title='Jazz Cancelled', date=now + timedelta(days=1), is_active=False)
+        create_event(title='Jazz_Club', date=now + timedelta(days=4))
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('typist'))
+
+    def test_title_then_venue_prefix_matches(self):
+        response = self.client.get('/api/events/autocomplete/', {'q': 'JAZZ'})
+        self.assertEqual(
+            [event['title'] for event in response.data],
+            ['jazz brunch', 'Jazz Night', 'Jazz_Club', 'Rock Night'],
+        )
+        self.assertEqual(set(response.data[0]), {'id', 'title', 'venue', 'date'})
+
+    def test_wildcards_are_literal(self):
+        response = self.client.get('/api/events/autocomplete/', {'q': 'jazz_'})
+        self.assertEqual([event['title'] for event in response.data], ['Jazz_Club'])
+
+    def test_short_terms_skip_the_query(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/events/autocomplete/', {'q': 'j'})
+        self.assertEqual(response.data, [])
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CATALOG_CACHE].clear()
+        self.event = create_event()
+        self.ticket = Ticket.objects.create(event=self.event, name='Standard', price=20, quantity_avaible=10)
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('poller'))
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_event_detail_not_modified_until_tickets_change(self):
+        url = f'/api/events/{self.event.id}/'
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        reserve_tickets({self.ticket.id: 1})
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['tickets'][0]['quantity_avaible'], 9)
+
+        Ticket.objects.create(event=self.event, name='VIP', price=50, quantity_avaible=5)
+        self.assertEqual(self.revalidate(url, changed).status_code, 200)
+
+    def test_same_second_write_is_not_hidden_by_if_modified_since(self):
+        url = f'/api/events/{self.event.id}/'
+        response = self.client.get(url)
+        reserve_tickets({self.ticket.id: 1})
+        changed = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_striped_sales_change_the_ticket_etag(self):
+        set_striping(self.ticket, 2)
+        url = f'/api/ticket/{self.ticket.id}/'
+        response = self.client.get(url)
+
+        reserve_tickets({self.ticket.id: 1})
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_cached_list_not_modified(self):
+        response = self.client.get('/api/ticket/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate('/api/ticket/', response).status_code, 304)
+
+        self.ticket.name = 'Balcony'
+        self.ticket.save()
+        self.assertEqual(self.revalidate('/api/ticket/', response).status_code, 200)
+
+    def test_permissions_checked_before_not_modified(self):
+        url = f'/api/events/{self.event.id}/'
+        response = self.client.get(url)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.revalidate(url, response).status_code, 401)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL full-text search.')
+class EventSearchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer('searcher'))
+
+    def search(self, terms):
+        response = self.client.get('/api/events/', {'search': terms})
+        return [event['title'] for event in response.data['results']]
+
+    def test_ranked_search_uses_language_config(self):
+        create_event(title='Summer festival', description='Open air concerts')
+        create_event(title='Jazz night', description='A festival favourite returns')
+        create_event(title='Yaz konserleri', language='TR', description='Şarkıcılar sahnede')
+        create_event(title='Opera', venue='Festivals Hall')
+        rock = create_event(title='Rock gecəsi', language='AZ')
+        rock.category.add(Category.objects.create(name='Metal'))
+
+        self.assertEqual(self.search('festivals'), ['Summer festival', 'Opera', 'Jazz night'])
+        self.assertEqual(self.search('konser'), ['Yaz konserleri'])
+        self.assertEqual(self.search('metal'), ['Rock gecəsi'])
+        self.assertEqual(self.search('gecə'), [])
+
+    def test_category_rename_and_delete_refresh_vectors(self):
+        category = Category.objects.create(name='Metal')
+        create_event(title='Rock night').category.add(category)
+
+        category.name = 'Blues'
+        category.save()
+        self.assertEqual(self.search('metal'), [])
+        self.assertEqual(self.search('blues'), ['Rock night'])
+
+        category.delete()
+        self.assertEqual(self.search('blues'), [])
+
+
+class WaitingRoomTests(TestCase):
+
+    def setUp(self):
+        caches[settings.WAITING_ROOM_CACHE].clear()
+        self.event = create_event(admission_rate=1)
+        self.ticket = Ticket.objects.create(event=self.event, name='VIP', price=100, quantity_avaible=10)
+        self.first = APIClient()
+        self.first.force_authenticate(create_customer('first'))
+        self.second = APIClient()
+        self.second.force_authenticate(create_customer('second'))
+
+    def buy(self, client, token=None):
+        headers = {'HTTP_X_QUEUE_TOKEN': token} if token else {}
+        return client.post('/api/order-items/', {'ticket': self.ticket.id, 'quantity': 1}, format='json', **headers)
+
+    def test_buyers_are_admitted_in_order(self):
+        self.assertEqual(self.buy(self.first).status_code, 429)
+
+        with patch('event.waiting_room.clock', return_value=1000):
+            first = self.first.post(f'/api/events/{self.event.id}/queue/').data
+            second = self.second.post(f'/api/events/{self.event.id}/queue/').data
+        self.assertEqual((first['position'], second['position']), (1, 2))
+
+        with patch('event.waiting_room.clock', return_value=1061):
+            response = self.client.get('/api/queue/status/', {'token': second['token']})
+            self.assertEqual(response.data['ahead'], 0)
+            self.assertFalse(response.data['admitted'])
+
+            self.assertEqual(self.buy(self.first, first['token']).status_code, 200)
+            self.assertEqual(self.buy(self.second, second['token']).status_code, 429)
+            self.assertEqual(self.buy(self.second, first['token']).status_code, 429)
+
+        with patch('event.waiting_room.clock', return_value=1121):
+            self.assertEqual(self.buy(self.second, second['token']).status_code, 200)
+            self.assertEqual(self.buy(self.first, first['token']).status_code, 429)
+
+    def test_failed_purchase_keeps_the_admission(self):
+        with patch('event.waiting_room.clock', return_value=1000):
+            token = self.first.post(f'/api/events/{self.event.id}/queue/').data['token']
+        with patch('event.waiting_room.clock', return_value=1061):
+            sold_out = self.first.post(
+                '/api/order-items/', {'ticket': self.ticket.id, 'quantity': 11}, format='json', HTTP_X_QUEUE_TOKEN=token,
+            )
+            self.assertEqual(sold_out.status_code, 400)
+            self.assertEqual(self.buy(self.first, token).status_code, 200)
+
+    def test_polling_an_empty_queue_does_not_delay_the_next_buyer(self):
+        with patch('event.waiting_room.clock', return_value=1000):
+            token = self.first.post(f'/api/events/{self.event.id}/queue/').data['token']
+        for now in range(1061, 1200, 5):
+            with patch('event.waiting_room.clock', return_value=now):
+                self.client.get('/api/queue/status/', {'token': token})
+        with patch('event.waiting_room.clock', return_value=1200):
+            joined = self.second.post(f'/api/events/{self.event.id}/queue/').data
+        self.assertTrue(joined['admitted'])
+
+    def test_only_the_lock_holder_moves_the_frontier(self):
+        with patch('event.waiting_room.clock', return_value=1000):
+            token = self.first.post(f'/api/events/{self.event.id}/queue/').data['token']
+        cache = caches[settings.WAITING_ROOM_CACHE]
+        cache.add(f'waiting-room:{self.event.id}:lock', 1)
+        with patch('event.waiting_room.clock', return_value=1061):
+            self.assertFalse(self.client.get('/api/queue/status/', {'token': token}).data['admitted'])
+            cache.delete(f'waiting-room:{self.event.id}:lock')
+            self.assertTrue(self.client.get('/api/queue/status/', {'token': token}).data['admitted'])
+
+    def test_process_local_cache_is_flagged(self):
+        self.assertEqual(check_waiting_room_cache(None), [])
+        with self.settings(CACHES={**settings.CACHES, 'waiting_room': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in check_waiting_room_cache(None)], ['event.W001'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL row locks.')
+class OrderItemConcurrencyTests(TransactionTestCase):
+    stock = 100
+    buyers = 40
+    purchases_per_buyer = 8
+    workers = 20
+
+    def setUp(self):
+        self.ticket = Ticket.objects.create(
+            event=create_event(), name='General Admission', price=10, quantity_avaible=self.stock
+        )
+        self.customers = [create_customer(f'buyer{i}') for i in range(self.buyers)]
+
+    def purchase(self, customer):
+        client = APIClient()
+        client.force_authenticate(customer)
+        statuses = []
+        try:
+            for _ in range(self.purchases_per_buyer):
+                response = client.post(
+                    '/api/order-items/', [{'ticket': self.ticket.id, 'quantity': 1}], format='json'
+                )
+                statuses.append(response.status_code)
+        finally:
+            connection.close()
+        return statuses
+
+    def test_parallel_purchases_never_oversell(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = [code for result in pool.map(self.purchase, self.customers) for code in result]
+        elapsed = time.perf_counter() - started
+
+        self.ticket.refresh_from_db()
+        sold = sum(OrderItem.objects.filter(ticket=self.ticket).values_list('quantity', flat=True))
+
+        self.assertEqual(len(statuses), self.buyers * self.purchases_per_buyer)
+        self.assertEqual(statuses.count(200), self.stock)
+        self.assertEqual(statuses.count(400), len(statuses) - self.stock)
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(self.ticket.quantity_avaible, 0)
+        self.assertLess(elapsed, 60, f'{len(statuses)} purchases took {elapsed:.1f}s')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL row locks.')
+class StripedOrderItemConcurrencyTests(OrderItemConcurrencyTests):
+
+    def setUp(self):
+        super().setUp()
+        set_striping(self.ticket, 8)
+
+    def test_parallel_purchases_never_oversell(self):
+        super().test_parallel_purchases_never_oversell()
+        self.assertEqual(Ticket.objects.with_available().get(pk=self.ticket.pk).available, 0)
@@ -15,10 +15,13 @@ router.register('promocode', views.PromoCodeViewSet, basename='promocode')
 
 urlpatterns = [
     path('health_check/', views.HealthCheckAPIView.as_view()),
+    path('queue/status/', views.QueueStatusAPIView.as_view(), name='queue-status'),
     path('order-items/', views.OrderItemAPIView.as_view()),
     path('orders/', views.OrderAPIView.as_view()),
     path('orders/<int:pk>/', views.OrderAPIView.as_view()),
+    path('orders/<int:pk>/fulfillment/', views.OrderFulfillmentAPIView.as_view(), name='order-fulfillment'),
     path('ticket/<int:pk>/pdf/', TicketPDFView.as_view(), name='ticket-pdf'),
+    path('orders/<int:pk>/pdf/', views.OrderPDFView.as_view(), name='order-pdf'),
     path('orders/<int:pk>/apply_promo/', ApplyPromoAPIView.as_view()),
     path('reviews/', ReviewListCreateAPIView.as_view(), name='reviews'),
     path('wallet/balance/', wallet_balance, name='wallet-balance'),
@@ -1,69 +1,192 @@
 from rest_framework import permissions
 from django.contrib.auth import get_user_model
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from django.conf import settings
+from django.db.models import Prefetch
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import hashlib
 import os
-import qrcode
+import time
 import uuid
 from django.core.mail import EmailMessage
+from .models import Order, OrderItem
+from .outbox import enqueue_email
+from .rendering import render_pages
 
 User = get_user_model()
 
-def send_ticket_email(order_item, pdf_path):
+def send_order_email(order, pdf_path):
+    # Queued in the email outbox; drain_outbox delivers it. All of the
+    # order's tickets travel as one PDF with a page per seat.
     subject = "🎟️ iTicket - Your Ticket Confirmation"
-    message = f"Hi {order_item.order.customer.username},\n\nYour order has been successfully completed!\nYour ticket has been added.\n\nThank you!"
+    message = f"Hi {order.customer.username},\n\nYour order has been successfully completed!\nYour tickets are attached.\n\nThank you!"
     email = EmailMessage(
         subject,
         message,
-        to=[order_item.order.customer.email]
+        to=[order.customer.email]
     )
-    email.attach_file(pdf_path)
-    email.send()
-
-
-def generate_ticket_pdf(order_item, promo_code=None, discount_amount=None, final_price=None):
-
-    tickets_dir = os.path.join(settings.MEDIA_ROOT, 'tickets')
-    os.makedirs(tickets_dir, exist_ok=True)
-
-    file_path = os.path.join(tickets_dir, f"ticket_{order_item.id}.pdf")
-    c = canvas.Canvas(file_path, pagesize=A4)
-    width, height = A4
-
-    c.setFont("Helvetica-Bold", 20)
-    c.drawString(200, height - 100, "✓ iTicket - Event Ticket")
-
-    c.setFont("Helvetica", 14)
-    c.drawString(100, height - 160, f"Event: {order_item.ticket.event.title}")
-    c.drawString(100, height - 190, f"Venue: {order_item.ticket.event.venue}")
-    c.drawString(100, height - 220, f"Date: {order_item.ticket.event.date.strftime('%Y-%m-%d %H:%M')}")
-    c.drawString(100, height - 260, f"Ticket: {order_item.ticket.name}")
-    c.drawString(100, height - 290, f"Price: {order_item.ticket.price} AZN")
-    c.drawString(100, height - 320, f"Quantity: {order_item.quantity}")
-    c.drawString(100, height - 350, f"Total price: {order_item.quantity * order_item.ticket.price}")
-    c.drawString(100, height - 380, f"Promo code: {promo_code}")
-    c.drawString(100, height - 410, f"Discount_amount: {discount_amount}")
-    c.drawString(100, height - 440, f"Final price: {final_price}")
-    c.drawString(100, height - 490, f"Customer: {order_item.order.customer.username}")
-    c.drawString(100, height - 520, f"Status: {order_item.order.status}")
-
-
-    c.setFont("Helvetica-Oblique", 12)
-    c.drawString(100, height - 570, "Please bring this ticket to the event entrance.")
+    with open(pdf_path, 'rb') as pdf:
+        email.attach(f"order_{order.id}.pdf", pdf.read(), 'application/pdf')
+    enqueue_email(email)
+
+
+# Bump when the ticket layout changes so cached PDFs are rendered again.
+TICKET_PDF_VERSION = 2
+
+
+def _ticket_lines(order_item):
+    # Order-level values come from the order itself, so every caller prints
+    # (and hashes, see _pdf_path) the same text for the same ticket.
+    event = order_item.ticket.event
+    order = order_item.order
+    return [
+        (160, f"Event: {event.title}"),
+        (190, f"Venue: {event.venue}"),
+        (220, f"Date: {event.date.strftime('%Y-%m-%d %H:%M')}"),
+        (260, f"Ticket: {order_item.ticket.name}"),
+        (290, f"Price: {order_item.ticket.price} AZN"),
+        (320, f"Quantity: {order_item.quantity}"),
+        (350, f"Total price: {order_item.quantity * order_item.ticket.price}"),
+        (380, f"Promo code: {getattr(order.promo_code, 'code', None)}"),
+        (410, f"Discount_amount: {order.discount_amount}"),
+        (440, f"Final price: {order.final_price}"),
+        (490, f"Customer: {order.customer.username}"),
+        (520, f"Status: {order.status}"),
+    ]
+
+
+def _qr_data(order_item, seat=None):
+    data = f"TicketID:{order_item.id}|Order:{order_item.order.id}|User:{order_item.order.customer.username}"
+    if seat is not None:
+        data += f"|Seat:{seat}"
+    return f"{data}|UUID:{uuid.uuid4()}"
+
+
+def _pdf_path(name, material):
+    """
+    Where a rendering lives: the file name carries a hash of everything
+    printed on it, so a changed price, promo, status or event detail maps to
+    a new file and unchanged content to the existing one.
+    """
+    key = hashlib.sha256(repr([TICKET_PDF_VERSION, material]).encode()).hexdigest()[:32]
+    return os.path.join(settings.MEDIA_ROOT, 'tickets', f"{name}_{key}.pdf")
+
+
+def ticket_pdf_path(order_item, lines):
+    return _pdf_path(f"ticket_{order_item.id}", [order_item.id, order_item.order_id, lines])
+
+
+def _store_pdf(file_path, pdf):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # Write under a private name and move into place, so concurrent
+    # downloads never see a half-written file. Superseded renderings stay
+    # until purge_stale_pdfs, as a download may be about to open them.
+    partial_path = f"{file_path}.{uuid.uuid4().hex}.partial"
+    with open(partial_path, 'wb') as partial:
+        partial.write(pdf)
+    os.replace(partial_path, file_path)
+    return file_path
 
-    qr_data = f"TicketID:{order_item.id}|Order:{order_item.order.id}|User:{order_item.order.customer.username}|UUID:{uuid.uuid4()}"
-    qr = qrcode.make(qr_data)
-    qr_path = os.path.join(tickets_dir, f"qr_{order_item.id}.png")
-    qr.save(qr_path)
 
-    qr_size = 150
-    c.drawImage(qr_path, 100, 100, qr_size, qr_size)
+def purge_stale_pdfs(grace_seconds, now=None):
+    """
+    Deletes renderings superseded by a newer one of the same ticket or
+    order at least `grace_seconds` ago. Returns the number deleted.
+    """
+    now = now or time.time()
+    renderings = {}
+    for file_path in glob.glob(os.path.join(settings.MEDIA_ROOT, 'tickets', '*.pdf')):
+        try:
+            modified = os.path.getmtime(file_path)
+        except FileNotFoundError:
+            continue
+        renderings.setdefault(os.path.basename(file_path).rsplit('_', 1)[0], []).append((modified, file_path))
+
+    purged = 0
+    for versions in renderings.values():
+        versions.sort()
+        newest = versions[-1][0]
+        if len(versions) < 2 or newest > now - grace_seconds:
+            continue
+        for _, file_path in versions[:-1]:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                continue
+            purged += 1
+    return purged
+
+
+def render_ticket_pdf(order_item):
+    """
+    The ticket as PDF bytes, rendered in memory with a vector QR code and
+    no temporary files. `generate_ticket_pdf` caches the result on disk.
+    """
+    lines = _ticket_lines(order_item)
+    return render_pages([(lines, _qr_data(order_item))])
+
+
+def generate_ticket_pdf(order_item):
+
+    lines = _ticket_lines(order_item)
+    file_path = ticket_pdf_path(order_item, lines)
+    if os.path.exists(file_path):
+        return file_path
+    return _store_pdf(file_path, render_pages([(lines, _qr_data(order_item))]))
+
+
+def orders_for_rendering(queryset):
+    return queryset.select_related('customer', 'promo_code').prefetch_related(
+        Prefetch('orderitems', queryset=OrderItem.objects.select_related('ticket__event').order_by('id'))
+    )
 
 
-    c.showPage()
-    c.save()
-    return file_path
+def _order_pages(order):
+    pages = []
+    for order_item in order.orderitems.all():
+        lines = _ticket_lines(order_item)
+        for seat in range(1, order_item.quantity + 1):
+            pages.append((lines + [(540, f"Seat: {seat} of {order_item.quantity}")], _qr_data(order_item, seat)))
+    return pages
+
+
+def order_pdf_path(order, pages):
+    return _pdf_path(f"order_{order.id}", [order.id, [lines for lines, _ in pages]])
+
+
+def render_order_pdfs(orders, workers=None):
+    """
+    One PDF per order with a page per seat, cached like single tickets.
+    Returns the file path by order id and the number of orders rendered;
+    the rest were already cached. Orders without a current rendering
+    are spread over a process pool of up to `workers` processes
+    (TICKET_RENDER_WORKERS). Rendering is CPU bound, so threads would only
+    queue on the GIL. `orders` should come from `orders_for_rendering()`.
+    """
+    workers = min(workers or settings.TICKET_RENDER_WORKERS, os.cpu_count() or 1)
+    paths, missing = {}, []
+    for order in orders:
+        pages = _order_pages(order)
+        paths[order.id] = order_pdf_path(order, pages)
+        if not os.path.exists(paths[order.id]):
+            missing.append((paths[order.id], pages))
+
+    if workers > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(missing) // (workers * 4))
+            pdfs = pool.map(render_pages, [pages for _, pages in missing], chunksize=chunksize)
+            for (file_path, _), pdf in zip(missing, pdfs):
+                _store_pdf(file_path, pdf)
+    else:
+        for file_path, pages in missing:
+            _store_pdf(file_path, render_pages(pages))
+    return paths, len(missing)
+
+
+def generate_order_pdf(order):
+    paths, _ = render_order_pdfs(orders_for_rendering(Order.objects.filter(pk=order.pk)), workers=1)
+    return paths[order.pk]
 
 
 def has_role(user, role):
@@ -1,17 +1,17 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from .models import Event, Category, Ticket, Order, OrderItem, PromoCode, Review, Wallet
-from .serializers import EventListModelSerializer, EventModelSerializer, OrderItemModelSerializer, OrderModelSerializer, PromoCodeSerializer, ReviewSerializer
+from .serializers import EventAutocompleteSerializer, EventListModelSerializer, EventModelSerializer, OrderItemModelSerializer, OrderModelSerializer, PromoCodeSerializer, ReviewSerializer
+from .serializers import OrderLineSerializer
 from .serializers import TicketModelSerializer
 from .serializers import CategoryModelSerializer
 from rest_framework.views import APIView
 from rest_framework import viewsets
 from rest_framework import generics
 from rest_framework.decorators import action
-from rest_framework import permissions, status
+from rest_framework import permissions, status, serializers
 from django_filters import rest_framework as filters
-from rest_framework import filters as drf_filters
-from .paginators import CustomPageNumberPagination
+from .paginators import CustomPageNumberPagination, TicketPageNumberPagination
 from .permissions import (
     CanManageEvents, 
     CanApplyDiscount, 
@@ -20,17 +20,29 @@ from .permissions import (
     IsOrganizerOrAdmin,
     IsCustomerOrAdmin
 )
-from .filters import EventFilter, TicketFilter
-from django.http import FileResponse
-from .utils import generate_ticket_pdf, send_ticket_email
+from .filters import EventFilter, TicketFilter, EventSearchFilter, EventOrderingFilter
+from . import waiting_room
+from .idempotency import idempotent
+from .response_cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .facets import event_facets
+from . import autocomplete
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header
+from .utils import generate_order_pdf, generate_ticket_pdf
+from .inventory import clear_order_holds, lock_order_holds, release_order_holds, set_striping, InsufficientStock
+from .orders import load_tickets, place_order
+from .fulfillment import enqueue_order, fulfillment_status
 import os
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, Prefetch
 import decimal
 from decimal import Decimal
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from django.conf import settings
 
 
 class HealthCheckAPIView(APIView):
@@ -38,31 +50,80 @@ class HealthCheckAPIView(APIView):
         return Response({'status':'ok'})
     
 
-class EventViewSet (viewsets.ModelViewSet):
+class EventViewSet (ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventModelSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageEvents]
-    filter_backends = [filters.DjangoFilterBackend, drf_filters.SearchFilter, drf_filters.OrderingFilter]
+    filter_backends = [filters.DjangoFilterBackend, EventSearchFilter, EventOrderingFilter]
     search_fields = ['title', 'description', 'venue', 'category__name']
     ordering_fields = ['title', 'date', 'venue']
     ordering = ['date']
     pagination_class = CustomPageNumberPagination
     filterset_class = EventFilter
+    cache_tag = 'event'
+    cache_depends_on = ['category']
+    conditional_fields = {
+        'retrieve': ['updated_at', 'tickets__updated_at', 'tickets__stripes__updated_at'],
+    }
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'upcoming']:
             return EventListModelSerializer
+        if self.action == 'autocomplete':
+            return EventAutocompleteSerializer
         return EventModelSerializer
 
+    def get_cache_timeout(self):
+        timeout = super().get_cache_timeout()
+        if self.action == 'upcoming':
+            change = Event.objects.next_upcoming_change()
+            if change is not None:
+                timeout = min(timeout, max(int((change - timezone.now()).total_seconds()) + 1, 1))
+        return timeout
+
+    def get_cache_tags(self):
+        tags = super().get_cache_tags()
+        ticket_filters = {'sold_out', 'price_min', 'price_max'} & set(self.request.query_params)
+        if self.action in ['list', 'upcoming'] or ticket_filters:
+            tags.append('ticket')
+        return tags
+
+    def get_response_cache_tags(self, data):
+        if self.action == 'retrieve':
+            return [f'ticket:{ticket["id"]}' for ticket in data['tickets']]
+        return []
+
     def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action == 'upcoming':
+            queryset = queryset.upcoming()
+        if self.action in ['list', 'upcoming']:
+            queryset = (
+                queryset
+                .only('id', 'title', 'date', 'venue', 'language', 'rating_sum', 'rating_count')
+                .with_ticket_summary()
+            )
+        elif self.action == 'join_queue':
+            queryset = queryset.only('id', 'admission_rate')
+        elif self.action == 'facets':
+            queryset = queryset.only('id')
+        elif self.action == 'autocomplete':
+            queryset = queryset.only('id', 'title', 'venue', 'date')
+        else:
+            queryset = queryset.prefetch_related(
+                'category',
+                Prefetch('tickets', queryset=Ticket.objects.with_available()),
+            )
+
         venue = self.request.query_params.get('venue')
         if venue:
-            return self.queryset.filter(venue=venue)
-        return super().get_queryset()
+            return queryset.filter(venue=venue)
+        return queryset
     
     def get_permissions(self):
 
-        if self.action == 'list' or self.action == 'retrieve':
+        if self.action in ['list', 'retrieve', 'join_queue', 'upcoming', 'facets', 'autocomplete']:
             permission_classes = [permissions.IsAuthenticated]
 
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -82,15 +143,63 @@ class EventViewSet (viewsets.ModelViewSet):
         serializer.save() 
         return Response({'message': 'Event name changed successfully', 'event': EventModelSerializer(event).data})
 
+    @action(detail=False, methods=['get'], url_path='upcoming')
+    def upcoming(self, request):
+        return self.list(request)
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        return self.cached_response(self.facet_counts, request)
+
+    def facet_counts(self, request):
+        return Response(event_facets(self.filter_queryset(self.get_queryset())))
+
+    @action(detail=False, methods=['get'], url_path='autocomplete')
+    def autocomplete(self, request):
+        if len(request.query_params.get('q', '').strip()) < autocomplete.MIN_LENGTH:
+            return Response([])
+        return self.cached_response(self.autocomplete_results, request)
+
+    def autocomplete_results(self, request):
+        events = autocomplete.autocomplete_events(
+            self.get_queryset(), request.query_params['q'].strip(), settings.AUTOCOMPLETE_LIMIT,
+        )
+        return Response(self.get_serializer(events, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path='queue')
+    def join_queue(self, request, pk=None):
+        event = self.get_object()
+        if not event.admission_rate:
+            return Response({'error': 'This event has no waiting room'}, status=400)
+        return Response(waiting_room.join(event, request.user), status=status.HTTP_201_CREATED)
+
+
+class QueueStatusAPIView(APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = []
+
+    def get(self, request):
+        queue_status = waiting_room.status(request.query_params.get('token', ''))
+        if queue_status is None:
+            return Response({'error': 'Invalid or expired queue token'}, status=400)
+        return Response(queue_status)
 
-class TicketViewSet(viewsets.ModelViewSet):
-    queryset = Ticket.objects.all()
+
+class TicketViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Ticket.objects.with_available().select_related('event')
     serializer_class = TicketModelSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageTickets]
     search_fields = ['event__title']
     ordering_fields = ['event_title', 'name', 'price', 'current_price', 'discount_percentage']
     ordering = ['price']
     filterset_class = TicketFilter
+    pagination_class = TicketPageNumberPagination
+    cache_tag = 'ticket'
+    cache_depends_on = ['event']
+    conditional_fields = {
+        'retrieve': ['updated_at', 'event__updated_at', 'stripes__updated_at'],
+    }
 
     def get_permissions(self):
 
@@ -108,13 +217,36 @@ class TicketViewSet(viewsets.ModelViewSet):
         discount_percentage = request.data.get('discount_percentage', 0)
         ticket.current_price = ticket.price * decimal.Decimal(1-discount_percentage/100)
         ticket.discount_percentage = discount_percentage
-        ticket.save()
+        ticket.save(update_fields=['current_price', 'discount_percentage', 'updated_at'])
         return Response({'message': 'Discount applied successfully', 'ticket': TicketModelSerializer(ticket).data})
 
+    @action(detail=True, methods=['post'], url_path='striping')
+    def striping(self, request, pk=None):
+        ticket = self.get_object()
+        try:
+            stripes = int(request.data.get('stripes', 0))
+        except (TypeError, ValueError):
+            return Response({'error': 'stripes must be an integer'}, status=400)
+
+        if not 0 <= stripes <= settings.TICKET_MAX_STRIPES:
+            return Response({'error': f'stripes must be between 0 and {settings.TICKET_MAX_STRIPES}'}, status=400)
+
+        ticket = set_striping(ticket, stripes)
+        return Response({'message': 'Ticket striping updated successfully', 'ticket': TicketModelSerializer(ticket).data})
+
     @action(detail=False, methods=['get'], url_path='most_discounted_tickets')
     def order_most_discounted_tickets(self, request):
-        tickets = self.queryset.order_by('-discount_percentage')
-        return Response(self.get_serializer(tickets, many=True).data)
+        return self.cached_response(self.most_discounted_page, request)
+
+    def most_discounted_page(self, request):
+        tickets = self.get_queryset().most_discounted()[:settings.MOST_DISCOUNTED_TICKETS_LIMIT]
+        page = self.paginate_queryset(tickets)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def get_cache_timeout(self):
+        if self.action == 'order_most_discounted_tickets':
+            return settings.MOST_DISCOUNTED_TICKETS_CACHE_TIMEOUT
+        return super().get_cache_timeout()
     
     @action(detail=True, methods=['post'], url_path='change_name')
     def change_name(self, request, pk=None): 
@@ -145,10 +277,11 @@ class TicketViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Ticket event changed successfully', 'ticket': TicketModelSerializer(ticket).data})
     
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategoryModelSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageCategories]
+    cache_tag = 'category'
 
     def get_permissions(self):
 
@@ -179,9 +312,8 @@ class OrderItemAPIView(APIView):
     serializer_class = OrderItemModelSerializer
     permission_classes = [IsCustomerOrAdmin]
 
+    @idempotent
     def post(self, request):
-        wallet = request.user.wallet
-        order = Order.objects.create(customer=request.user)
         data = request.data.copy()
 
         if isinstance(data, dict):
@@ -190,23 +322,25 @@ class OrderItemAPIView(APIView):
             import json
             data = json.loads(data)
 
-        for item in data:
-            item['order'] = order.id
-
-        serializer = self.serializer_class(data=data, many=True)
+        serializer = OrderLineSerializer(data=data, many=True)
         serializer.is_valid(raise_exception=True)
-        order_items = serializer.save()
+        lines = serializer.validated_data
 
-        total_cost = 0
-
-        for order_item in order_items:
-            ticket = order_item.ticket
-            total_cost += ticket.current_price * order_item.quantity
+        tickets = load_tickets(lines)
+        admissions = waiting_room.check_admission(request, {ticket.event for ticket in tickets.values()})
 
+        try:
+            try:
+                order, order_items, total_cost = place_order(request.user, lines, tickets)
+            except InsufficientStock as e:
+                raise serializers.ValidationError(str(e))
+        except Exception:
+            waiting_room.release_admission(admissions)
+            raise
 
         return Response({'message': 'Order created successfully', 
                          'total_spent': float(total_cost),
-                         'order items':serializer.data})
+                         'order items': self.serializer_class(order_items, many=True).data})
 
 
 class OrderAPIView(APIView):
@@ -223,9 +357,10 @@ class OrderAPIView(APIView):
             return Response(self.serializer_class(order).data)
                  
 
-        orders = self.queryset.filter(customer=request.user)
+        orders = self.queryset.filter(customer=request.user).prefetch_related('orderitems')
         return Response(self.serializer_class(orders, many=True).data)
     
+    @idempotent
     def patch(self, request, pk=None):
         try:
             order = self.queryset.get(id=pk)
@@ -235,57 +370,84 @@ class OrderAPIView(APIView):
         if order.customer != request.user:
             return Response({'message': 'You are not authorized to update this order'}, status=status.HTTP_403_FORBIDDEN)
 
-        previous_status = order.status
-        serializer = self.serializer_class(order, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            # The order is re-read under lock so the expired-hold sweeper
+            # cannot release its stock and cancel it mid-confirm.
+            holds = lock_order_holds(order)
+            order = self.queryset.select_for_update().get(pk=order.pk)
 
-        wallet = request.user.wallet
+            previous_status = order.status
+            requested_status = request.data.get('status')
 
-        if previous_status != 'cancelled' and order.status == 'cancelled':
-            refund_amount = order.final_price or order.total_price or Decimal('0.00')
-            wallet.deposit(refund_amount)
+            if previous_status == 'cancelled' and requested_status == 'confirmed':
+                return Response({'error': 'Cancelled orders cannot be confirmed.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({
-                'message': f'Order cancelled. {refund_amount} AZN refunded to wallet.',
-                'wallet_balance': wallet.balance
-            })
+            if previous_status == 'pending' and requested_status == 'confirmed':
+                if any(hold.expires_at <= timezone.now() for hold in holds):
+                    release_order_holds(order)
+                    order.status = 'cancelled'
+                    order.save()
+                    return Response({'error': 'Your reservation has expired.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if previous_status != 'confirmed' and serializer.data['status'] == 'confirmed':
+            serializer = self.serializer_class(order, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
 
-            total_cost = order.final_price or order.total_price or Decimal('0.00')
+            wallet = Wallet.objects.select_for_update().get(user=request.user)
+
+            if previous_status != 'cancelled' and order.status == 'cancelled':
+                release_order_holds(order)
+                refund_amount = order.final_price or order.total_price or Decimal('0.00')
+                wallet.deposit(refund_amount)
 
-            if wallet.balance < total_cost:
-                order.status = 'pending'
-                order.save()
                 return Response({
-                    'error': 'Your balance is not enough.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                wallet.balance -= total_cost
-                wallet.save()
+                    'message': f'Order cancelled. {refund_amount} AZN refunded to wallet.',
+                    'wallet_balance': wallet.balance
+                })
+
+            if previous_status != 'confirmed' and serializer.data['status'] == 'confirmed':
+
+                total_cost = order.final_price or order.total_price or Decimal('0.00')
 
-            for order_item in order.orderitems.all():
-                promo_code_str = getattr(order.promo_code, 'code', None)
-                discount_amount = order.discount_amount
-                final_price = order.final_price
+                if wallet.balance < total_cost:
+                    order.status = 'pending'
+                    order.save()
+                    return Response({
+                        'error': 'Your balance is not enough.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
 
-                pdf_path = generate_ticket_pdf(
-                    order_item,
-                    promo_code_str,
-                    discount_amount,
-                    final_price
-                )
-                send_ticket_email(order_item, pdf_path)
+                if clear_order_holds(order) != len(holds):
+                    transaction.set_rollback(True)
+                    return Response({
+                        'error': 'Your reservation was released while confirming. Please try again.'
+                    }, status=status.HTTP_409_CONFLICT)
 
+                wallet.balance -= total_cost
+                wallet.save()
+
+                # Rendering and email happen in the fulfillment workers, see
+                # event/fulfillment.py; the client polls the fulfillment status.
+                enqueue_order(order)
                 return Response({
-                'message': f'Order confirmed. {total_cost} AZN has been deducted from your balance and tickets have been sent.',
-                'wallet_balance': wallet.balance
-            })
+                    'message': f'Order confirmed. {total_cost} AZN has been deducted from your balance and your tickets will be emailed shortly.',
+                    'wallet_balance': wallet.balance,
+                    'fulfillment': fulfillment_status(order),
+                })
 
-        return Response({'message': 'Order updated successfully', 'order': serializer.data})
+            return Response({'message': 'Order updated successfully', 'order': serializer.data})
     
 
+class OrderFulfillmentAPIView(APIView):
+    permission_classes = [IsCustomerOrAdmin]
+
+    def get(self, request, pk):
+        try:
+            order = Order.objects.get(id=pk, customer=request.user)
+        except Order.DoesNotExist:
+            return Response({'error': 'Order not found or access denied'}, status=404)
+        return Response(fulfillment_status(order))
+
+
 class PromoCodeViewSet(viewsets.ModelViewSet):
     queryset = PromoCode.objects.all()
     serializer_class = PromoCodeSerializer
@@ -403,16 +565,44 @@ class TicketPDFView(APIView):
 
     def get(self, request, pk):
         try:
-            order_item = OrderItem.objects.get(id=pk, order__customer=request.user)
-            order = order_item.order
-            promo_code = order.promo_code
-            discount_amount = order.discount_amount
-            final_price = order.final_price
+            order_item = OrderItem.objects.select_related(
+                'order__customer', 'order__promo_code', 'ticket__event',
+            ).get(id=pk, order__customer=request.user)
         except OrderItem.DoesNotExist:
             return Response({'error': 'Ticket not found or access denied'}, status=404)
 
-        file_path = generate_ticket_pdf(order_item, promo_code, discount_amount, final_price)
-        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=os.path.basename(file_path))
+        # Rendered once per distinct ticket content, see ticket_pdf_path().
+        file_path = generate_ticket_pdf(order_item)
+        return pdf_download(request, file_path, f"ticket_{order_item.id}.pdf")
+
+
+class OrderPDFView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            # Tickets carry scannable QR codes: only paid orders get them.
+            order = Order.objects.get(id=pk, customer=request.user, status=Order.OrderStatus.CONFIRMED)
+        except Order.DoesNotExist:
+            return Response({'error': 'Order not found or access denied'}, status=404)
+        return pdf_download(request, generate_order_pdf(order), f"order_{order.id}.pdf")
+
+
+def pdf_download(request, file_path, filename):
+    # Cached PDFs are named after a hash of their content, which makes the
+    # name a strong validator.
+    etag = f'"{os.path.splitext(os.path.basename(file_path))[0]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if settings.TICKET_PDF_ACCEL_REDIRECT:
+            response = HttpResponse(content_type='application/pdf')
+            response['X-Accel-Redirect'] = settings.TICKET_PDF_ACCEL_REDIRECT.rstrip('/') + '/' + os.path.relpath(file_path, settings.MEDIA_ROOT)
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+        else:
+            response = FileResponse(open(file_path, 'rb'), as_attachment=True, filename=filename)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 class ReviewListCreateAPIView(generics.ListCreateAPIView):
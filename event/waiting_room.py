@@ -0,0 +1,165 @@
+import math
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+
+TOKEN_SALT = 'event.waiting_room'
+TOKEN_HEADER = 'HTTP_X_QUEUE_TOKEN'
+LOCK_TIMEOUT = 5
+
+
+def clock():
+    # Queue time, separate from time.time() so tests can move it without
+    # also moving cache expiry.
+    return time.time()
+
+
+def _cache():
+    return caches[settings.WAITING_ROOM_CACHE]
+
+
+def _key(event_id, name):
+    return f'waiting-room:{event_id}:{name}'
+
+
+@contextmanager
+def _lock(event_id, wait=0):
+    """
+    Yields whether the event's queue lock was taken. cache.add() is atomic
+    on every shared backend, unlike incr() and get/set on some of them.
+    """
+    cache = _cache()
+    deadline = time.monotonic() + wait
+    while not cache.add(_key(event_id, 'lock'), 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.005)
+    try:
+        yield True
+    finally:
+        cache.delete(_key(event_id, 'lock'))
+
+
+def _admitted(event_id, rate, now=None):
+    """
+    Position of the last admitted buyer. The frontier moves forward by `rate`
+    positions per minute, but never past the last issued position, so a quiet
+    queue does not bank admissions for the next rush.
+    """
+    cache = _cache()
+    now = now or clock()
+
+    # Reading, advancing and storing the frontier would interleave between
+    # workers and move it backwards or skip ahead, so only the holder of the
+    # lock advances it. Everyone else answers from the stored frontier, which
+    # the holder refreshes within milliseconds.
+    with _lock(event_id) as locked:
+        if not locked:
+            state = cache.get(_key(event_id, 'frontier'))
+            return int(state[0]) if state else 0
+
+        issued = cache.get(_key(event_id, 'issued'), 0)
+        state = cache.get(_key(event_id, 'frontier')) or (0.0, now)
+
+        frontier = state[0] + max(now - state[1], 0) * rate / 60
+        if frontier <= issued:
+            stamp = max(now, state[1])
+        else:
+            # Capped at the last issued position: keep the time already
+            # accrued so the next buyer is not held back by frequent polls,
+            # but bank at most one admission.
+            frontier = max(issued, state[0])
+            stamp = max(state[1], now - 60 / rate)
+        cache.set(_key(event_id, 'frontier'), (frontier, stamp), None)
+    return int(frontier)
+
+
+def _status(event_id, position, rate):
+    admitted = _admitted(event_id, rate)
+    ahead = max(position - admitted - 1, 0)
+    return {
+        'event': event_id,
+        'position': position,
+        'admitted': position <= admitted,
+        'ahead': ahead,
+        'estimated_wait': 0 if position <= admitted else math.ceil((position - admitted) * 60 / rate),
+    }
+
+
+def join(event, user):
+    cache = _cache()
+    cache.set(_key(event.id, 'rate'), event.admission_rate, None)
+    with _lock(event.id, wait=LOCK_TIMEOUT) as locked:
+        if not locked:
+            raise Throttled(wait=1, detail='The waiting room is busy, please try again.')
+        position = cache.get(_key(event.id, 'issued'), 0) + 1
+        cache.set(_key(event.id, 'issued'), position, None)
+
+    token = signing.dumps({'e': event.id, 'p': position, 'u': user.id}, salt=TOKEN_SALT, compress=True)
+    return {'token': token, **_status(event.id, position, event.admission_rate)}
+
+
+def read_token(token):
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=settings.WAITING_ROOM_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def status(token):
+    payload = read_token(token)
+    if payload is None:
+        return None
+
+    rate = _cache().get(_key(payload['e'], 'rate'))
+    if not rate:
+        return None
+    return _status(payload['e'], payload['p'], rate)
+
+
+def check_admission(request, events):
+    """
+    Raises `Throttled` unless the request carries an admitted queue token for
+    every queued event in `events`. Each admission buys once: the returned
+    claims mark the tokens used, and `release_admission` hands them back if
+    the purchase fails.
+    """
+    queued = {event.id: event.admission_rate for event in events if event.admission_rate}
+    if not queued:
+        return []
+
+    tokens = {}
+    for token in request.META.get(TOKEN_HEADER, '').split(','):
+        payload = read_token(token.strip())
+        if payload and payload['u'] == request.user.id:
+            tokens[payload['e']] = payload['p']
+
+    for event_id, rate in queued.items():
+        if event_id not in tokens:
+            raise Throttled(detail=f'Join the waiting room for event {event_id} before buying tickets.')
+
+        current = _status(event_id, tokens[event_id], rate)
+        if not current['admitted']:
+            raise Throttled(
+                wait=current['estimated_wait'],
+                detail=f'You are in the waiting room for event {event_id}, {current["ahead"]} buyers ahead of you.',
+            )
+
+    cache = _cache()
+    claims = []
+    for event_id in queued:
+        claim = _key(event_id, f'used:{tokens[event_id]}')
+        if not cache.add(claim, 1, settings.WAITING_ROOM_TOKEN_MAX_AGE):
+            release_admission(claims)
+            raise Throttled(detail=f'Your queue token for event {event_id} was already used. Join the waiting room again.')
+        claims.append(claim)
+    return claims
+
+
+def release_admission(claims):
+    if claims:
+        _cache().delete_many(claims)
@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.response import Response
@@ -13,6 +13,7 @@ from .serializers import (
     ForgotPasswordSerializer, ResetPasswordSerializer,
 )
 from .utils import generate_numeric_code, expiry
+from event.outbox import enqueue_mail
 
 User = get_user_model()
 
@@ -23,20 +24,21 @@ class RegisterView(APIView):
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
-
-        otp = OneTimeCode.objects.create(
-            user=user,
-            purpose=OneTimeCode.Purpose.ACCOUNT_ACTIVATION,
-            code=generate_numeric_code(6),
-            expires_at=expiry(10),
-        )
-        send_mail(
-            subject='Your activation code',
-            message=f'Your code is: {otp.code}',
-            from_email=None,
-            recipient_list=[user.email],
-        )
+
+        with transaction.atomic():
+            user = serializer.save()
+            otp = OneTimeCode.objects.create(
+                user=user,
+                purpose=OneTimeCode.Purpose.ACCOUNT_ACTIVATION,
+                code=generate_numeric_code(6),
+                expires_at=expiry(10),
+            )
+            enqueue_mail(
+                subject='Your activation code',
+                message=f'Your code is: {otp.code}',
+                recipient_list=[user.email],
+                expires_at=otp.expires_at,
+            )
         return Response({'detail': 'Registered. Check email for activation code.'}, status=status.HTTP_201_CREATED)
 
 
@@ -48,18 +50,19 @@ class ResendActivationOTPView(APIView):
         ser.is_valid(raise_exception=True)
         user = ser.validated_data['user']
 
-        otp = OneTimeCode.objects.create(
-            user=user,
-            purpose=OneTimeCode.Purpose.ACCOUNT_ACTIVATION,
-            code=generate_numeric_code(6),
-            expires_at=expiry(10),
-        )
-        send_mail(
-            subject='Your activation code',
-            message=f'Your code is: {otp.code}',
-            from_email=None,
-            recipient_list=[user.email],
-        )
+        with transaction.atomic():
+            otp = OneTimeCode.objects.create(
+                user=user,
+                purpose=OneTimeCode.Purpose.ACCOUNT_ACTIVATION,
+                code=generate_numeric_code(6),
+                expires_at=expiry(10),
+            )
+            enqueue_mail(
+                subject='Your activation code',
+                message=f'Your code is: {otp.code}',
+                recipient_list=[user.email],
+                expires_at=otp.expires_at,
+            )
         return Response({'detail': 'Activation code sent.'})
 
 
@@ -119,18 +122,19 @@ class ForgotPasswordView(APIView):
         ser.is_valid(raise_exception=True)
         user = ser.validated_data['user']
 
-        otp = OneTimeCode.objects.create(
-            user=user,
-            purpose=OneTimeCode.Purpose.PASSWORD_RESET,
-            code=generate_numeric_code(6),
-            expires_at=expiry(10),
-        )
-        send_mail(
-            subject='Your password reset code',
-            message=f'Your code is: {otp.code}',
-            from_email=None,
-            recipient_list=[user.email],
-        )
+        with transaction.atomic():
+            otp = OneTimeCode.objects.create(
+                user=user,
+                purpose=OneTimeCode.Purpose.PASSWORD_RESET,
+                code=generate_numeric_code(6),
+                expires_at=expiry(10),
+            )
+            enqueue_mail(
+                subject='Your password reset code',
+                message=f'Your code is: {otp.code}',
+                recipient_list=[user.email],
+                expires_at=otp.expires_at,
+            )
         return Response({'detail': 'Reset code sent if the email exists.'})
 
 